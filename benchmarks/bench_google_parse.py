@@ -0,0 +1,68 @@
+"""
+Offline parse benchmark for the Google Images scraper, using the result
+pages in benchmarks/fixtures/. Compares extract_image_urls with the old
+BeautifulSoup html.parser pass when bs4 is installed.
+
+    python benchmarks/bench_google_parse.py [--rounds 50]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_crawler.search import extract_image_urls  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def bs4_image_urls(html):
+    from bs4 import BeautifulSoup
+
+    urls = []
+    for img_tag in BeautifulSoup(html, "html.parser").find_all("img"):
+        img_url = img_tag.get("data-src") or img_tag.get("src")
+        if img_url and img_url.startswith("https://") and not any(x in img_url for x in ["logo", "sprite"]):
+            urls.append(img_url)
+    return urls
+
+
+def bench(name, parse, pages, rounds):
+    total_bytes = sum(len(p.encode("utf-8")) for p in pages)
+    found = sum(len(parse(p)) for p in pages)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            parse(page)
+    elapsed = time.perf_counter() - start
+    n = rounds * len(pages)
+    print(f"{name:<22} {n / elapsed:9.1f} pages/s {total_bytes * rounds / elapsed / 1e6:8.1f} MB/s "
+          f"{elapsed / n * 1000:8.2f} ms/page {found / len(pages):6.0f} urls/page")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(FIXTURES, "google_isch_*.html")))
+    if not paths:
+        sys.exit(f"no fixtures in {FIXTURES}, run benchmarks/make_google_fixtures.py")
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+
+    bench("extract_image_urls", extract_image_urls, pages, args.rounds)
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        print("bs4 not installed, skipping html.parser baseline")
+    else:
+        bench("bs4 html.parser", bs4_image_urls, pages, max(1, args.rounds // 10))
+
+
+if __name__ == "__main__":
+    main()
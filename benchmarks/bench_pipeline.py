@@ -0,0 +1,155 @@
+"""
+Offline end-to-end benchmark of the search + download pipeline against
+benchmarks/mock_server.py, which runs in its own process so it doesn't
+compete with the crawler for the GIL. Reports images/s, MB/s, time to
+first image, per-stage p50/p99, CPU time and peak memory.
+
+    python benchmarks/bench_pipeline.py [-n 200] [--engine Unsplash] [--queries 1] [--json]
+
+Server options (--latency, --error-rate, --throttle-rps, ...) are passed
+through to mock_server.py. Exits non-zero if --min-rate is given and not
+reached, so it can gate a build.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SERVER = os.path.join(ROOT, "benchmarks", "mock_server.py")
+sys.path.insert(0, ROOT)
+
+
+class BenchEvents:
+    def __init__(self, verbose):
+        self.verbose = verbose
+        self.started = time.perf_counter()
+        self.first_image = None
+        self.summary = None
+
+    def put(self, item):
+        message, data = item
+        if message in ("progress", "query_progress") and self.first_image is None:
+            self.first_image = time.perf_counter() - self.started
+        elif message == "metrics":
+            self.summary = data
+        elif message == "log" and self.verbose:
+            print(data, file=sys.stderr)
+
+
+def start_server(server_args):
+    proc = subprocess.Popen([sys.executable, MOCK_SERVER] + server_args, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        proc.wait()
+        sys.exit("mock server failed to start")
+    return proc, json.loads(line)
+
+
+def _peak_mb(maxrss):
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=200, help="images per query (default: 200)")
+    parser.add_argument("-e", "--engine", choices=("Unsplash", "Google API", "Google API+Unsplash"),
+                        default="Unsplash",
+                        help="Google API is capped at 100 results per query, like the real API; "
+                             "Google API+Unsplash fans out over both")
+    parser.add_argument("--queries", type=int, default=1, help="queries, run as a batch if more than one")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--per-host", type=int, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--dedup", action="store_true",
+                        help="dedup against the index (the mock reuses images, so most become duplicates)")
+    parser.add_argument("--no-upscale", dest="upscale", action="store_false")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep the crawler's configured rate limits (off by default to measure the pipeline)")
+    parser.add_argument("--min-rate", type=float, default=0, help="fail if images/s ends up below this")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print crawler log lines")
+    return parser
+
+
+def main(argv=None):
+    args, server_args = build_parser().parse_known_args(argv)
+    server, urls = start_server(server_args)
+    try:
+        # Set before image_crawler is imported, since its config reads them once
+        os.environ["GOOGLE_API_ENDPOINT"] = urls["api"] + "/customsearch/v1"
+        os.environ["UNSPLASH_ENDPOINT"] = urls["api"] + "/search/photos"
+        os.environ["SEARCH_CACHE_TTL"] = "0"
+        if not args.rate_limits:
+            for name in ("RATE_LIMIT_PER_HOST", "GOOGLE_API_RATE", "UNSPLASH_API_RATE"):
+                os.environ[name] = "0"
+        from image_crawler import CrawlOptions, run_crawl, run_batch
+
+        options = CrawlOptions(engine=args.engine, max_n=args.number, dedup=args.dedup, https_only=False,
+                               upscale=args.upscale, resume=False)
+        for name in ("workers", "per_host", "processes"):
+            if getattr(args, name) is not None:
+                setattr(options, name, getattr(args, name))
+        events = BenchEvents(args.verbose)
+        with tempfile.TemporaryDirectory() as folder:
+            options.folder = folder
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            if args.queries == 1:
+                run_crawl("bench", options, events)
+            else:
+                run_batch([f"bench {i}" for i in range(args.queries)], options, events)
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            # The image worker processes have been reaped by now, the mock server hasn't
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    finally:
+        server.terminate()
+        server.wait()
+
+    summary = events.summary
+    images = summary["counters"].get("images", 0)
+    report = {
+        "engine": args.engine,
+        "queries": args.queries,
+        "images": images,
+        "errors": {k[len("errors."):]: v for k, v in summary["counters"].items() if k.startswith("errors.")},
+        "wall_s": wall,
+        "images_per_sec": images / wall if wall > 0 else 0.0,
+        "mb_per_sec": summary["counters"].get("bytes", 0) / wall / 1024 / 1024 if wall > 0 else 0.0,
+        "first_image_s": events.first_image,
+        "cpu_s": cpu,
+        "cpu_children_s": children.ru_utime + children.ru_stime,
+        "peak_rss_mb": _peak_mb(self_usage.ru_maxrss),
+        "peak_rss_children_mb": _peak_mb(children.ru_maxrss),
+        "stages": {
+            stage: {"p50_ms": s["p50"] * 1000, "p99_ms": s["p99"] * 1000, "count": s["count"]}
+            for stage, s in summary["stages"].items()
+        },
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        first = f"{report['first_image_s']:.2f}s" if report["first_image_s"] is not None else "-"
+        print(f"{images} images in {wall:.2f}s: {report['images_per_sec']:.1f} images/s, "
+              f"{report['mb_per_sec']:.1f} MB/s, first image after {first}")
+        print(f"CPU {cpu:.2f}s (+{report['cpu_children_s']:.2f}s in image workers), "
+              f"peak RSS {report['peak_rss_mb']:.0f} MB (workers {report['peak_rss_children_mb']:.0f} MB)")
+        for stage, s in report["stages"].items():
+            print(f"  {stage:<12} p50 {s['p50_ms']:8.1f} ms  p99 {s['p99_ms']:8.1f} ms  n={s['count']}")
+        if report["errors"]:
+            print("  errors: " + ", ".join(f"{k}={v}" for k, v in sorted(report["errors"].items())))
+    if args.min_rate and report["images_per_sec"] < args.min_rate:
+        print(f"FAIL: {report['images_per_sec']:.1f} images/s is below --min-rate {args.min_rate}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Writes the synthetic Google Images result pages in benchmarks/fixtures/.
+They copy the parts of a real page the scraper cares about (viewer JSON
+with full-res URLs, <img> thumbnails, logos/sprites, lots of inline
+script and style noise) so parsing can be benchmarked offline.
+Deterministic; re-run after changing it:
+
+    python benchmarks/make_google_fixtures.py
+"""
+import json
+import os
+import random
+import string
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+HOSTS = ["i.pinimg.com", "upload.wikimedia.org", "live.staticflickr.com", "images.example-food.com", "cdn.mm-recipes.net"]
+
+
+def _token(rng, n):
+    return "".join(rng.choice(string.ascii_letters + string.digits + "-_") for _ in range(n))
+
+
+def _thumb(rng):
+    return f"https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9Gc{_token(rng, 40)}&usqp=CAU"
+
+
+def _full(rng):
+    ext = rng.choice(["jpg", "jpg", "jpeg", "png", "webp"])
+    return f"https://{rng.choice(HOSTS)}/{_token(rng, 8)}/{_token(rng, 12)}.{ext}"
+
+
+def make_page(seed, results=100):
+    rng = random.Random(seed)
+    noise_js = "".join(f"var _{_token(rng, 6)}=function(a){{return a.{_token(rng, 4)}||{rng.randrange(999)}}};" for _ in range(800))
+    noise_css = "".join(f".{_token(rng, 5)}{{margin:{rng.randrange(20)}px;color:#{rng.randrange(16**6):06x}}}" for _ in range(600))
+    entries, tags = [], []
+    for i in range(results):
+        thumb, full = _thumb(rng), _full(rng)
+        meta = [None, _token(rng, 14), [thumb, rng.randrange(150, 260), rng.randrange(150, 300)],
+                [full, rng.randrange(400, 3000), rng.randrange(400, 4000)], None, 0, "rgb(%d,%d,%d)" % (
+                    rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+                {"2003": [None, _token(rng, 12), f"https://{rng.choice(HOSTS)}/page/{_token(rng, 10)}",
+                          f"Dish photo {i}", None, None, None, None, None, "Recipes"]}]
+        entries.append(meta)
+        tags.append(
+            f'<div class="{_token(rng, 6)}" data-ri="{i}"><a href="/imgres?imgurl={full}&amp;tbnid={_token(rng, 14)}">'
+            f'<img class="rg_i Q4LuWd" alt="Dish photo {i}" '
+            + (f'src="data:image/gif;base64,R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw==" data-src="{thumb.replace("&", "&amp;")}"'
+               if i >= 20 else f'src="{thumb.replace("&", "&amp;")}"')
+            + ' width="194" height="259"></a></div>'
+        )
+    payload = json.dumps([None, [[None, entries]]], separators=(",", ":"))
+    # Google escapes '=' and '&' inside its JSON as \u003d and \u0026
+    payload = payload.replace("=", "\\u003d").replace("&", "\\u0026")
+    return "".join([
+        "<!doctype html><html itemscope><head><meta charset=\"UTF-8\"><title>Google Search</title>",
+        f"<style>{noise_css}</style><script nonce=\"{_token(rng, 22)}\">{noise_js}</script></head><body>",
+        '<img src="https://www.google.com/images/branding/googlelogo/1x/googlelogo_color_92x30dp.png" alt="Google">',
+        '<img src="https://www.gstatic.com/images/icons/material/system/1x/sprite_24dp.png">',
+        '<div id="islrg"><div class="islrc">', "".join(tags), "</div></div>",
+        f"<script nonce=\"{_token(rng, 22)}\">AF_initDataCallback({{key: 'ds:1', hash: '2', data:{payload}, sideChannel: {{}}}});</script>",
+        f"<script>{noise_js[: len(noise_js) // 2]}</script></body></html>",
+    ])
+
+
+def main():
+    os.makedirs(FIXTURES, exist_ok=True)
+    for seed in range(3):
+        path = os.path.join(FIXTURES, f"google_isch_{seed}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_page(seed))
+        print(f"wrote {path} ({os.path.getsize(path) // 1024} KB)")
+
+
+if __name__ == "__main__":
+    main()
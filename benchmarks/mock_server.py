@@ -0,0 +1,207 @@
+"""
+Local stand-in for the Google Custom Search and Unsplash APIs and the
+image hosts they point at, for offline benchmarks. One port serves both
+search APIs and each of --hosts further ports is an image host, so
+per-host limits apply as they would across real origins. Images are
+generated at startup (varied sizes and formats, a few too small to keep)
+and everything is deterministic for a given --seed.
+
+    python benchmarks/mock_server.py [--hosts 4] [--latency 50] [--error-rate 0.05]
+
+Prints one JSON line with the API and image host base URLs, then serves
+until killed.
+"""
+import argparse
+import io
+import json
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from PIL import Image
+
+# (width, height, Pillow format); the 64x64 ones fall under MIN_IMAGE_WIDTH/HEIGHT
+SHAPES = [
+    (320, 240, "JPEG"), (640, 480, "JPEG"), (800, 600, "JPEG"), (1280, 960, "JPEG"), (1920, 1080, "JPEG"),
+    (2560, 1440, "JPEG"), (500, 375, "PNG"), (1024, 768, "PNG"), (800, 600, "WEBP"), (1600, 1200, "WEBP"),
+    (400, 300, "GIF"), (64, 64, "PNG"),
+]
+_EXT = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+
+def make_catalog(seed, variants=2):
+    """Encoded images: `variants` of every shape, noise over a gradient so they compress like photos."""
+    rng = random.Random(seed)
+    catalog = []
+    for _ in range(variants):
+        for width, height, fmt in SHAPES:
+            noise = Image.effect_noise((width, height), rng.randrange(20, 60)).convert("RGB")
+            gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+            tint = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+            img = Image.blend(Image.blend(noise, gradient, 0.5), tint, 0.4)
+            buf = io.BytesIO()
+            img.save(buf, format=fmt, **({"quality": 85} if fmt in ("JPEG", "WEBP") else {}))
+            catalog.append((buf.getvalue(), fmt))
+    return catalog
+
+
+class _Throttle:
+    """Per-port token bucket; requests over the rate get a 429."""
+
+    def __init__(self, rps):
+        self.rps = rps
+        self.tokens = rps
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if self.rps <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rps, self.tokens + (now - self.stamp) * self.rps)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The crawler hangs up mid-body on images it rejects from the header
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockServer:
+    def __init__(self, args):
+        self.args = args
+        self.catalog = make_catalog(args.seed)
+        self.api = self._listen(args.throttle_rps)
+        self.hosts = [self._listen(args.throttle_rps) for _ in range(args.hosts)]
+        self.attempts = {}
+        self.api_calls = 0
+        self.lock = threading.Lock()
+
+    def _listen(self, rps):
+        server = _Server(("127.0.0.1", 0), _Handler)
+        server.mock = self
+        server.throttle = _Throttle(rps)
+        return server
+
+    def base(self, server):
+        return f"http://127.0.0.1:{server.server_port}"
+
+    def image_url(self, i):
+        _, fmt = self.catalog[i % len(self.catalog)]
+        return f"{self.base(self.hosts[i % len(self.hosts)])}/img/{i}.{_EXT[fmt]}"
+
+    def serve_forever(self):
+        for server in [self.api] + self.hosts:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(json.dumps({"api": self.base(self.api), "images": [self.base(h) for h in self.hosts]}), flush=True)
+        threading.Event().wait()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        mock = self.server.mock
+        args = mock.args
+        if not self.server.throttle.allow():
+            return self._send(429, b"", "text/plain", {"Retry-After": "1"})
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        rng = random.Random(f"{args.seed}:{url.path}")
+        time.sleep(max(0.0, args.latency + rng.uniform(-args.jitter, args.jitter)) / 1000)
+        if url.path == "/customsearch/v1":
+            start = int(query.get("start", ["1"])[0]) - 1
+            num = int(query.get("num", ["10"])[0])
+            items = [{"link": mock.image_url(i)} for i in range(start, min(start + num, args.results))]
+            return self._json({"items": items} if items else {})
+        if url.path == "/search/photos":
+            per_page = int(query.get("per_page", ["10"])[0])
+            start = (int(query.get("page", ["1"])[0]) - 1) * per_page
+            # Numbered after the Custom Search results so fanned-out engines return different images
+            results = [
+                {"urls": {"full": mock.image_url(args.results + i)}}
+                for i in range(start, min(start + per_page, args.results))
+            ]
+            with mock.lock:
+                mock.api_calls += 1
+                remaining = max(0, args.api_quota - mock.api_calls)
+            headers = {"X-Ratelimit-Limit": str(args.api_quota), "X-Ratelimit-Remaining": str(remaining)}
+            return self._json({"total": args.results, "results": results}, headers)
+        if url.path.startswith("/img/"):
+            i = int(url.path[len("/img/"):].split(".")[0])
+            if rng.random() < args.error_rate:
+                return self._send(404, b"not found", "text/plain")
+            if rng.random() < args.flaky_rate:
+                # Fails the first time only, like a briefly overloaded origin
+                with mock.lock:
+                    mock.attempts[i] = mock.attempts.get(i, 0) + 1
+                    first = mock.attempts[i] == 1
+                if first:
+                    return self._send(503, b"try again", "text/plain")
+            data, fmt = mock.catalog[i % len(mock.catalog)]
+            return self._send(200, data, _TYPES[fmt])
+        self._send(404, b"", "text/plain")
+
+    def _json(self, data, headers=None):
+        self._send(200, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        rate = self.server.mock.args.bandwidth * 1024
+        if rate <= 0:
+            self.wfile.write(body)
+            return
+        step = 16 * 1024
+        for i in range(0, len(body), step):
+            self.wfile.write(body[i:i + step])
+            time.sleep(step / rate)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=4, help="image host ports (default: 4)")
+    parser.add_argument("--results", type=int, default=500, help="search results per query (default: 500)")
+    parser.add_argument("--latency", type=float, default=50, help="ms before each response (default: 50)")
+    parser.add_argument("--jitter", type=float, default=20, help="± ms around --latency (default: 20)")
+    parser.add_argument("--bandwidth", type=float, default=0, help="KB/s per response, 0 for unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of images that 404 (default: 0.05)")
+    parser.add_argument("--flaky-rate", type=float, default=0.05,
+                        help="share of images that 503 on the first try (default: 0.05)")
+    parser.add_argument("--throttle-rps", type=float, default=0,
+                        help="requests/s per port before answering 429, 0 for no throttling")
+    parser.add_argument("--api-quota", type=int, default=5000,
+                        help="X-Ratelimit-Limit reported by the Unsplash mock (default: 5000)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.hosts < 1:
+        sys.exit("--hosts must be at least 1")
+    MockServer(args).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Search + download engine behind Image Downloader Pro. Has no GUI
+dependencies, so it can be imported on headless machines or run as
+`python -m image_crawler`.
+"""
+from .backends import SearchBackend, FanOutBackend, register_backend, get_backend, backend_names
+from .cache import SearchCache
+from .config import CATEGORIES
+from .dedup import ImageIndex
+from .events import CoalescingEvents
+from .engine import CrawlOptions, DownloadError, run_crawl, run_batch
+from .journal import CrawlJournal
+from .metrics import Metrics, format_summary
+from .pool import ConcurrentDownloader, FairSemaphore
+from .search import get_search_cache, set_search_cache
+
+__all__ = [
+    "CATEGORIES", "CrawlOptions", "DownloadError", "run_crawl", "run_batch",
+    "SearchBackend", "FanOutBackend", "register_backend", "get_backend", "backend_names",
+    "ConcurrentDownloader", "FairSemaphore", "SearchCache", "get_search_cache", "set_search_cache",
+    "ImageIndex", "CrawlJournal", "CoalescingEvents", "Metrics", "format_summary",
+]
@@ -0,0 +1,180 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+from .config import (
+    GOOGLE_API_KEY, GOOGLE_CX, GOOGLE_API_ENDPOINT, GOOGLE_API_RATE, UNSPLASH_ACCESS_KEY, UNSPLASH_ENDPOINT,
+    UNSPLASH_API_RATE, SCRAPE_PAGE_SIZE, SCRAPE_MAX_PAGES, SCRAPE_DELAY,
+)
+from .dedup import normalize_url
+from .net import RATE_LIMITER
+from .pool import Prefetcher
+from .search import iter_google_api, iter_unsplash, iter_google_scrape, _no_log
+
+
+class SearchBackend:
+    """
+    A search engine crawls can take image URLs from. Subclasses implement
+    search() as a lazy iterator that requests result pages only as they
+    are consumed, and describe the engine with class attributes:
+
+    page_size: results per request, also how far ahead fan-out prefetches
+    max_results: most results one query can return, None if unbounded
+    endpoint / rate: the API URL and the requests per second to hold its
+        host to; register_backend() sets that on the shared rate limiter
+    quota: the provider's usage limits, for people choosing an engine
+    """
+
+    name = None
+    page_size = 10
+    max_results = None
+    endpoint = None
+    rate = None
+    quota = ""
+
+    def search(self, query, log=_no_log, metrics=None):
+        raise NotImplementedError
+
+    def available(self):
+        """False if the engine can't work as configured, e.g. without an API key."""
+        return True
+
+
+class GoogleAPIBackend(SearchBackend):
+    name = "Google API"
+    page_size = 10
+    max_results = 100
+    endpoint = GOOGLE_API_ENDPOINT
+    rate = GOOGLE_API_RATE
+    quota = "100 queries/day free, 10,000/day paid"
+
+    def search(self, query, log=_no_log, metrics=None):
+        log("Using Google Custom Search API for high-res images...")
+        return iter_google_api(query, log, metrics)
+
+    def available(self):
+        return bool(GOOGLE_API_KEY and GOOGLE_CX)
+
+
+class GoogleScrapeBackend(SearchBackend):
+    name = "Google"
+    page_size = SCRAPE_PAGE_SIZE
+    max_results = SCRAPE_PAGE_SIZE * SCRAPE_MAX_PAGES
+    # The scrape rate comes from SCRAPE_DELAY and robots.txt, see search._set_scrape_rate
+    quota = f"none, one page per {SCRAPE_DELAY:g}s or the robots.txt crawl delay"
+
+    def search(self, query, log=_no_log, metrics=None):
+        return iter_google_scrape(query, log, metrics)
+
+
+class UnsplashBackend(SearchBackend):
+    name = "Unsplash"
+    page_size = 30
+    endpoint = UNSPLASH_ENDPOINT
+    rate = UNSPLASH_API_RATE
+    quota = "50 requests/hour for demo apps, 5,000/hour in production"
+
+    def search(self, query, log=_no_log, metrics=None):
+        log("Using Unsplash API for high-res images...")
+        return iter_unsplash(query, log, metrics)
+
+    def available(self):
+        return bool(UNSPLASH_ACCESS_KEY)
+
+
+class FanOutBackend(SearchBackend):
+    """
+    Searches several engines for the same query at once and merges their
+    URL streams in whatever order they arrive, dropping URLs another engine
+    already returned (compared with normalize_url). Each engine runs on its
+    own Prefetcher, a page ahead of the downloader, so the fastest sources
+    fill max_n while slower ones are only paged as far as needed. An engine
+    that fails or isn't configured is left out; the others carry on.
+    """
+
+    page_size = 0
+
+    def __init__(self, name, members):
+        self.name = name
+        self.members = list(members)
+        for member in self.members:
+            get_backend(member)
+
+    def search(self, query, log=_no_log, metrics=None):
+        backends = [get_backend(member) for member in self.members]
+        usable = [b for b in backends if b.available()]
+        if usable:
+            for backend in backends:
+                if backend not in usable:
+                    log(f"{backend.name} is not configured, searching without it.")
+            backends = usable
+        return self._merge(query, backends, log, metrics)
+
+    def _merge(self, query, backends, log, metrics):
+        feeds = {Prefetcher(b.search(query, log, metrics), b.page_size): b.name for b in backends}
+        seen = set()
+        try:
+            while feeds:
+                arrived = False
+                for feed, name in list(feeds.items()):
+                    try:
+                        url = feed.poll(0)
+                    except Exception as e:
+                        log(f"[ERROR] {name} search failed: {e}")
+                        del feeds[feed]
+                        continue
+                    if url is Prefetcher.EMPTY:
+                        if feed.exhausted:
+                            del feeds[feed]
+                        continue
+                    arrived = True
+                    key = normalize_url(url)
+                    if key not in seen:
+                        seen.add(key)
+                        yield url
+                if not arrived:
+                    time.sleep(0.02)
+        finally:
+            for feed in feeds:
+                feed.close()
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def register_backend(backend):
+    """
+    Adds a SearchBackend (an instance) to the engines crawls and the UIs
+    can choose from, replacing any with the same name. Returns it.
+    """
+    if backend.endpoint and backend.rate is not None:
+        RATE_LIMITER.configure(urlparse(backend.endpoint).netloc, backend.rate)
+    with _backends_lock:
+        _backends[backend.name] = backend
+    return backend
+
+
+def get_backend(name):
+    """
+    The registered backend called `name`. Names joined with "+" (e.g.
+    "Google API+Unsplash") give a FanOutBackend over those engines.
+    """
+    with _backends_lock:
+        backend = _backends.get(name)
+    if backend is not None:
+        return backend
+    if "+" in name:
+        return FanOutBackend(name, name.split("+"))
+    raise ValueError(f"Unknown engine {name!r}, expected one of: {', '.join(backend_names())}")
+
+
+def backend_names():
+    with _backends_lock:
+        return tuple(_backends)
+
+
+register_backend(GoogleAPIBackend())
+register_backend(GoogleScrapeBackend())
+register_backend(UnsplashBackend())
+register_backend(FanOutBackend("All", ["Google API", "Google", "Unsplash"]))
@@ -0,0 +1,181 @@
+import argparse
+import os
+import sys
+
+from .backends import backend_names, get_backend
+from .config import (
+    CATEGORIES, DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST, BATCH_PARALLEL_QUERIES, IMAGE_PROCESSES,
+    MIN_IMAGE_WIDTH, MIN_IMAGE_HEIGHT, MAX_IMAGE_BYTES,
+)
+from .engine import CrawlOptions, run_crawl, run_batch
+from .journal import CrawlJournal
+from .metrics import Metrics, format_summary
+from .search import set_search_cache
+
+
+class ConsoleEvents:
+    """Stands in for the GUI update queue and prints engine events."""
+
+    def __init__(self, max_n, verbose=False, query=None):
+        self.max_n = max_n
+        self.verbose = verbose
+        self.prefix = f"[{query}] " if query else ""
+
+    def put(self, item):
+        message, data = item
+        if message == "log":
+            if self.verbose or "[DEBUG]" not in data:
+                print(f"{self.prefix}{data}", file=sys.stderr)
+        elif message == "progress" and self.prefix:
+            print(f"{self.prefix}{data}/{self.max_n}", file=sys.stderr)
+        elif message == "query_progress":
+            query, n, max_n = data
+            print(f"[{query}] {n}/{max_n}", file=sys.stderr)
+        elif message == "query_finished":
+            query, downloaded, errors = data
+            print(f"[{query}] Download finished. Downloaded: {downloaded}, Errors: {errors}")
+        elif message == "metrics":
+            for line in format_summary(data):
+                print(f"{self.prefix}{line}", file=sys.stderr)
+        elif message == "finished":
+            downloaded, errors = data
+            print(f"{self.prefix}Download finished. Downloaded: {downloaded}, Errors: {errors}")
+
+
+def read_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def failed_queries(results, options):
+    """
+    Queries whose crawl raised or whose search found no URLs at all. A
+    query whose images were all skipped (duplicates, too small) has not
+    failed.
+    """
+    failed = [query for query, result in results.items() if result is None]
+    journal = CrawlJournal(options.folder)
+    try:
+        failed += [
+            query for query, result in results.items()
+            if result is not None and journal.job(query, options.engine).url_count() == 0
+        ]
+    finally:
+        journal.close()
+    return failed
+
+
+def parse_size(value):
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    return width, height
+
+
+def list_engines():
+    for name in backend_names():
+        backend = get_backend(name)
+        if getattr(backend, "members", None):
+            print(f"{name}: fans out over {', '.join(backend.members)}")
+            continue
+        status = "" if backend.available() else " (not configured)"
+        limit = f", at most {backend.max_results} per query" if backend.max_results else ""
+        print(f"{name}{status}: {backend.page_size} results per page{limit}; quota: {backend.quota}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="image_crawler", description="Download images without the GUI.")
+    parser.add_argument("queries", nargs="*", help="search queries; several queries are crawled as one batch")
+    parser.add_argument("--all-categories", action="store_true", help="crawl every built-in category")
+    parser.add_argument("-f", "--queries-file", help="file with one query per line (# starts a comment)")
+    parser.add_argument("-e", "--engine", action="append", choices=backend_names(),
+                        help="search engine (default: Google API); repeat to search several at once")
+    parser.add_argument("--list-engines", action="store_true", help="describe the search engines and exit")
+    parser.add_argument("-n", "--number", type=int, default=20, help="images per query (default: 20)")
+    parser.add_argument("-t", "--type", dest="ftype", choices=("any", "jpg", "png"), default="any")
+    parser.add_argument("--strict-type", action="store_true",
+                        help="skip images that aren't already --type instead of converting them")
+    parser.add_argument("--min-size", type=parse_size, default=(MIN_IMAGE_WIDTH, MIN_IMAGE_HEIGHT),
+                        metavar="WxH", help=f"skip smaller images (default: {MIN_IMAGE_WIDTH}x{MIN_IMAGE_HEIGHT})")
+    parser.add_argument("--max-mb", type=float, default=MAX_IMAGE_BYTES / 1024 / 1024,
+                        help="abort downloads larger than this")
+    parser.add_argument("-o", "--output", default=".", help="output folder (default: current dir)")
+    parser.add_argument("-w", "--workers", type=int, default=DOWNLOAD_WORKERS,
+                        help="parallel downloads, shared by all queries of a batch")
+    parser.add_argument("--per-host", type=int, default=DOWNLOAD_PER_HOST, help="parallel downloads per host")
+    parser.add_argument("-p", "--parallel-queries", type=int, default=BATCH_PARALLEL_QUERIES,
+                        help="queries crawled at the same time in a batch")
+    parser.add_argument("--processes", type=int, default=IMAGE_PROCESSES,
+                        help="processes that decode and resize images (0: do it in the download threads)")
+    parser.add_argument("--no-upscale", dest="upscale", action="store_false",
+                        help="keep small images at their original size (faster)")
+    parser.add_argument("--no-resume", dest="resume", action="store_false",
+                        help="start over instead of resuming an unfinished crawl of the same query")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false",
+                        help="don't skip images already in the output folder's index")
+    parser.add_argument("--no-search-cache", dest="search_cache", action="store_false",
+                        help="always query the search APIs instead of using cached results")
+    parser.add_argument("--metrics-jsonl", metavar="PATH",
+                        help="append every stage timing and counter, then the run summary, as JSON lines")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="write the run summary in the Prometheus text format (e.g. for a textfile collector)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also print [DEBUG] lines")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.list_engines:
+        list_engines()
+        return 0
+    queries = list(args.queries)
+    if args.all_categories:
+        queries += CATEGORIES
+    if args.queries_file:
+        queries += read_queries(args.queries_file)
+    queries = [q.strip() for q in queries if q.strip()]
+    if not queries:
+        parser.error("no queries given")
+
+    os.makedirs(args.output, exist_ok=True)
+    if not args.search_cache:
+        set_search_cache(None)
+    options = CrawlOptions(
+        engine="+".join(dict.fromkeys(args.engine or ["Google API"])),
+        ftype=args.ftype,
+        max_n=args.number,
+        folder=args.output,
+        workers=args.workers,
+        per_host=args.per_host,
+        dedup=args.dedup,
+        processes=args.processes,
+        upscale=args.upscale,
+        min_width=args.min_size[0],
+        min_height=args.min_size[1],
+        max_bytes=int(args.max_mb * 1024 * 1024),
+        strict_type=args.strict_type,
+        resume=args.resume,
+    )
+    sink = open(args.metrics_jsonl, "a", encoding="utf-8") if args.metrics_jsonl else None
+    metrics = Metrics(sink)
+    try:
+        if len(queries) == 1:
+            events = ConsoleEvents(args.number, args.verbose, queries[0])
+            results = {queries[0]: run_crawl(queries[0], options, events, metrics=metrics)}
+        else:
+            events = ConsoleEvents(args.number, args.verbose)
+            results = run_batch(queries, options, events, parallel=args.parallel_queries, metrics=metrics)
+    finally:
+        if sink is not None:
+            metrics.write_summary()
+            sink.close()
+        if args.metrics_prom:
+            with open(args.metrics_prom, "w", encoding="utf-8") as f:
+                f.write(metrics.prometheus())
+    # Non-zero exit if any query failed, so batch jobs notice
+    failed = failed_queries(results, options)
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+    return 1 if failed else 0
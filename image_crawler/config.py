@@ -0,0 +1,92 @@
+import os
+
+from dotenv import load_dotenv
+
+"""
+If you guys are familiar with dotenv then just create .env file in the same dir as this.
+Then in .env -> 
+GOOGLE_API_KEY="YOUR_API_KEY"
+GOOGLE_CX="GOOGLE_CX"
+and else ......
+"""
+
+load_dotenv()
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GOOGLE_CX = os.getenv("GOOGLE_CSE_ID")
+UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY")
+# Overridable so the APIs can be pointed at a mock server (see benchmarks/)
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT", 'https://www.googleapis.com/customsearch/v1')
+UNSPLASH_ENDPOINT = os.getenv("UNSPLASH_ENDPOINT", 'https://api.unsplash.com/search/photos')
+
+# Download concurrency, overridable from .env
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_PER_HOST = int(os.getenv("DOWNLOAD_PER_HOST", "4"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Downloads past RESUME_MIN_BYTES are spooled to a .part file (synced to the
+# crawl journal every RESUME_SYNC_BYTES) so they can be resumed with Range.
+# Part files are kept on local disk, out of the (maybe networked) output folder
+RESUME_MIN_BYTES = 1024 * 1024
+RESUME_SYNC_BYTES = 1024 * 1024
+RESUME_PARTS_DIR = os.getenv(
+    "RESUME_PARTS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "image_crawler", "parts")
+)
+
+# Processes that decode/resize/re-encode images; 0 does it in the download threads
+IMAGE_PROCESSES = int(os.getenv("IMAGE_PROCESSES", str(os.cpu_count() or 1)))
+
+# Retries for 429/5xx and dropped connections, with exponential backoff
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+# Requests per second to each image host (token bucket allowing bursts of
+# RATE_LIMIT_BURST) and to the search APIs; adapted down on 429/503 and
+# low X-RateLimit-Remaining, 0 means unlimited. Google's default Custom
+# Search quota is 100 queries a minute.
+RATE_LIMIT_PER_HOST = float(os.getenv("RATE_LIMIT_PER_HOST", "8"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "4"))
+GOOGLE_API_RATE = float(os.getenv("GOOGLE_API_RATE", "1.5"))
+UNSPLASH_API_RATE = float(os.getenv("UNSPLASH_API_RATE", "1"))
+# Longest a host is paused for Retry-After or an exhausted quota
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))
+
+# Search API responses are cached on disk so repeat runs skip the API;
+# SEARCH_CACHE_TTL=0 turns the cache off
+SEARCH_CACHE_PATH = os.getenv(
+    "SEARCH_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "image_crawler", "search.sqlite")
+)
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+SEARCH_CACHE_MAX_BYTES = int(float(os.getenv("SEARCH_CACHE_MAX_MB", "50")) * 1024 * 1024)
+
+# Google Images scraping: result pages to walk, how many to fetch at once
+# and the minimum gap in seconds between page requests (robots.txt can
+# ask for more)
+SCRAPE_PAGE_SIZE = 20
+SCRAPE_MAX_PAGES = int(os.getenv("SCRAPE_MAX_PAGES", "10"))
+SCRAPE_CONCURRENCY = max(1, int(os.getenv("SCRAPE_CONCURRENCY", "2")))
+SCRAPE_DELAY = float(os.getenv("SCRAPE_DELAY", "1.0"))
+
+TARGET_MIN_WIDTH, TARGET_MIN_HEIGHT = 600, 400
+
+# Downloads are dropped as soon as the header shows the image is smaller
+# than this (icons, spacers) or the body grows past MAX_IMAGE_MB
+MIN_IMAGE_WIDTH = int(os.getenv("MIN_IMAGE_WIDTH", "100"))
+MIN_IMAGE_HEIGHT = int(os.getenv("MIN_IMAGE_HEIGHT", "100"))
+MAX_IMAGE_BYTES = int(float(os.getenv("MAX_IMAGE_MB", "25")) * 1024 * 1024)
+# Give up on bodies whose first bytes don't parse as an image header
+SNIFF_LIMIT = 256 * 1024
+
+# Images whose perceptual hashes differ in at most this many of 64 bits
+# count as duplicates; -1 only skips exact (SHA-256) duplicates
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "5"))
+
+# Built-in dish categories, also what batch mode crawls by default
+CATEGORIES = [
+    "ထမင်းပေါင်း", "ကြာဇံချက်", "ကတ်ကြေးကိုက်", "ကြေးအိုးဆီချက်", "ကောက်ညှင်းပေါင်း",
+    "ခေါက်ဆွဲသုပ်", "တိုဖူးနွေး", "ထမနဲ", "နန်းကြီးသုပ်", "မုန့်ဖက်ထုပ်", "မုန့်လက်ဆောင်း", "မုန့်လင်မယား",
+    "မုန့်ဟင်းခါး", "ရွှေရင်အေး", "ရှမ်းခေါက်ဆွဲ", "လက်ဖက်သုပ်", "သာကူ", "အာပူလျှာပူ", "အုန်းနို့ခေါက်ဆွဲ", 
+    "ဝက်သားဒုတ်ထိုး", "cats" # Just for testing XDXD, I ain't gonna eat the cats...
+]
+
+# How many queries a batch crawls at the same time
+BATCH_PARALLEL_QUERIES = int(os.getenv("BATCH_PARALLEL_QUERIES", "8"))
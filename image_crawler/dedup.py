@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from PIL import Image
+
+from .config import DEDUP_MAX_DISTANCE
+
+# Query parameters that only track where a link came from
+_TRACKING_PARAMS = {"fbclid", "gclid", "ixid"}
+
+
+def normalize_url(url):
+    """Lowercases scheme/host, drops default ports, fragments and tracking params, sorts the query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme, parts.port) in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS and not k.startswith("utm_")
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def dhash(img, size=8):
+    """64-bit difference hash; visually similar images differ in only a few bits."""
+    small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class ImageIndex:
+    """
+    Persistent record of the images saved in one output folder, keyed by
+    normalized URL and by content (SHA-256 of the downloaded bytes plus a
+    dHash of the decoded image), so repeated crawls and other engines do
+    not save the same picture twice. Safe to share between threads.
+
+    Jobs call claim() once they know an image's hashes; a claimed image is
+    held back from other jobs until it is either add()ed or release()d.
+    Files are recorded by name only, so the folder can be opened from any
+    working directory or moved.
+    """
+
+    FILENAME = ".image_index.sqlite"
+
+    def __init__(self, folder, max_distance=DEDUP_MAX_DISTANCE):
+        self.folder = folder
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(folder, self.FILENAME), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                sha256 TEXT PRIMARY KEY,
+                phash TEXT NOT NULL,
+                path TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL REFERENCES images(sha256)
+            );
+        """)
+        self._phashes = {
+            sha: (int(phash, 16), self._path(path))
+            for sha, phash, path in self._db.execute("SELECT sha256, phash, path FROM images")
+        }
+        self._claimed = {}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def has_url(self, url):
+        """True if this URL was already saved and its file is still on disk."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT images.path FROM urls JOIN images USING (sha256) WHERE urls.url = ?",
+                (normalize_url(url),),
+            ).fetchone()
+        return row is not None and os.path.exists(self._path(row[0]))
+
+    def claim(self, sha256, phash):
+        """
+        Returns the path of an existing copy (exact or near-duplicate) of the
+        image, or None after reserving it for the caller.
+        """
+        with self._lock:
+            for other_sha, (other_phash, path) in list(self._phashes.items()) + list(self._claimed.items()):
+                if other_sha == sha256 or (
+                    self.max_distance >= 0 and bin(other_phash ^ phash).count("1") <= self.max_distance
+                ):
+                    if path is None or os.path.exists(path):
+                        return path or "(in progress)"
+                    # File was deleted since, forget it
+                    self._forget(other_sha)
+            self._claimed[sha256] = (phash, None)
+            return None
+
+    def release(self, sha256):
+        with self._lock:
+            self._claimed.pop(sha256, None)
+
+    def add(self, url, sha256, phash, path):
+        with self._lock:
+            self._claimed.pop(sha256, None)
+            self._phashes[sha256] = (phash, self._path(path))
+            self._db.execute(
+                "INSERT OR REPLACE INTO images (sha256, phash, path, created) VALUES (?, ?, ?, ?)",
+                (sha256, f"{phash:016x}", os.path.basename(path), time.time()),
+            )
+            self._db.execute("INSERT OR REPLACE INTO urls (url, sha256) VALUES (?, ?)", (normalize_url(url), sha256))
+            self._db.commit()
+
+    def _path(self, name):
+        # Older indexes stored the path as given, possibly relative to another directory
+        return os.path.join(self.folder, os.path.basename(name))
+
+    def _forget(self, sha256):
+        self._phashes.pop(sha256, None)
+        self._db.execute("DELETE FROM urls WHERE sha256 = ?", (sha256,))
+        self._db.execute("DELETE FROM images WHERE sha256 = ?", (sha256,))
+        self._db.commit()
@@ -0,0 +1,524 @@
+import os
+import re
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from itertools import chain
+from urllib.parse import urlparse
+
+import requests
+
+from .config import (
+    DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST, DOWNLOAD_CHUNK_SIZE, BATCH_PARALLEL_QUERIES, IMAGE_PROCESSES,
+    MIN_IMAGE_WIDTH, MIN_IMAGE_HEIGHT, MAX_IMAGE_BYTES, SNIFF_LIMIT, RESUME_MIN_BYTES, RESUME_SYNC_BYTES,
+)
+from .backends import get_backend
+from .dedup import ImageIndex
+from .journal import CrawlJournal
+from .metrics import Metrics
+from .net import SESSION, grow_pools
+from .pool import ConcurrentDownloader, FairSemaphore
+from .processing import ImageProcessor, HeaderSniffer
+
+
+class DownloadError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        # HTTP status of the failed response, if there was one
+        self.status = status
+
+
+# A downloaded image waiting in a temp file to be numbered and moved into place
+Staged = namedtuple("Staged", "tmp ext thumb url sha256 phash")
+
+# Processes images in the calling thread, for fetch_image without a processor
+_INLINE = ImageProcessor(0)
+
+
+@dataclass
+class CrawlOptions:
+    engine: str = "Google API"
+    ftype: str = "any"
+    max_n: int = 20
+    folder: str = "."
+    workers: int = DOWNLOAD_WORKERS
+    per_host: int = DOWNLOAD_PER_HOST
+    dedup: bool = True
+    https_only: bool = True
+    processes: int = IMAGE_PROCESSES
+    upscale: bool = True
+    min_width: int = MIN_IMAGE_WIDTH
+    min_height: int = MIN_IMAGE_HEIGHT
+    max_bytes: int = MAX_IMAGE_BYTES
+    # Drop images that aren't already `ftype` instead of converting them
+    strict_type: bool = False
+    # Pick up an unfinished crawl of the same query/engine where it stopped
+    resume: bool = True
+
+
+def run_crawl(
+    query, options, events, stop_event=None, slots=None, index=None, processor=None, journal=None, metrics=None
+):
+    """
+    Searches `options.engine` (the name of a registered SearchBackend, or
+    several joined with "+" to fan out over them) for `query` and
+    downloads up to `options.max_n` images into `options.folder`.
+    Progress is reported by putting
+    ("log" | "progress" | "thumbnail" | "finished", data) tuples on `events`,
+    anything with a queue-like put(). Returns (downloaded, errors).
+    Crawls that share a FairSemaphore as `slots` share its download budget.
+
+    With `options.dedup`, URLs and images already in the folder's
+    ImageIndex (or a near-duplicate of one) are skipped; pass `index` to
+    share an open index, otherwise one is opened for the crawl. Images are
+    decoded and resized on `processor` (an ImageProcessor), or on a pool of
+    `options.processes` started for the crawl.
+
+    Downloads start as soon as the first page of search results is in, and
+    further pages are only requested while more images are still needed.
+
+    Every crawl is recorded in the folder's CrawlJournal (or `journal`).
+    With `options.resume`, a crawl of the same query and engine that was
+    cancelled or crashed continues from its saved URLs: finished URLs
+    are not fetched again and large partial downloads resume from where
+    they stopped.
+
+    Stage timings and counters go to `metrics` (a Metrics, new for the
+    crawl if not given), and its summary is sent as a ("metrics", summary)
+    event before "finished".
+    """
+    stop_event = stop_event or threading.Event()
+    engine, max_n, folder = options.engine, options.max_n, options.folder
+    metrics = metrics or Metrics()
+    own_index = index is None and options.dedup
+    if not options.dedup:
+        index = None
+    own_processor = processor is None
+    own_journal = journal is None
+    grow_pools(SESSION, max(options.workers, options.per_host))
+
+    def log(message):
+        events.put(("log", message))
+
+    def discard(staged):
+        _remove(staged.tmp)
+        if index is not None:
+            index.release(staged.sha256)
+
+    downloaded_count = 0
+    error_count = 0
+    number = 0
+    stem = query.replace(' ', '_')
+    taken = None
+    try:
+        # Opened in here so a bad folder or engine still ends in "finished"
+        backend = get_backend(engine)
+        if own_index:
+            index = ImageIndex(folder)
+        if own_processor:
+            processor = ImageProcessor(options.processes)
+        if own_journal:
+            journal = CrawlJournal(folder)
+        job = journal.job(query, engine)
+        resume_urls = job.resume_urls() if options.resume else None
+        if resume_urls is not None:
+            downloaded_count = job.done_count()
+            log(f"Resuming {engine} crawl: {downloaded_count} done, {len(resume_urls)} URLs left.")
+            events.put(("progress", downloaded_count))
+        else:
+            job.start()
+        # Search pages are only requested as the downloader works through the
+        # URLs, so a resumed crawl only searches again if it runs short
+        image_urls = _journaled(backend.search(query, log, metrics), job)
+        if resume_urls is not None:
+            image_urls = chain(resume_urls, image_urls)
+
+        fetch = partial(
+            fetch_image, options=options, log=log, stop_event=stop_event, index=index, processor=processor, job=job,
+            metrics=metrics,
+        )
+        pool = ConcurrentDownloader(options.workers, options.per_host, stop_event, slots)
+        for img_url, staged, err in pool.imap(fetch, image_urls, max_n - downloaded_count, discard=discard):
+            if err is not None:
+                if stop_event.is_set():
+                    # Cancelled mid-transfer, leave it pending for the next run
+                    continue
+                error_count += 1
+                metrics.count(f"errors.{_error_category(err)}")
+                log(f"Skipped: {img_url[:70]}... | {err}")
+                job.failed(img_url, err)
+                continue
+            if staged is None:
+                metrics.count("skipped")
+                job.skipped(img_url)
+                continue
+            downloaded_count += 1
+            metrics.count("images")
+            # Never overwrite files from an earlier run of the same query
+            if taken is None:
+                taken = _taken_numbers(folder, stem)
+            number, fn = _free_path(folder, stem, number, staged.ext, taken)
+            os.replace(staged.tmp, fn)
+            if index is not None:
+                index.add(staged.url, staged.sha256, staged.phash, fn)
+            job.done(img_url, fn)
+            events.put(("progress", downloaded_count))
+            events.put(("thumbnail", staged.thumb))
+        if not stop_event.is_set():
+            job.finish()
+    except Exception as e:
+        log(f"[ERROR] {e}")
+        raise
+    finally:
+        if not stop_event.is_set():
+            events.put(("metrics", metrics.summary()))
+            events.put(("finished", (downloaded_count, error_count)))
+        if own_index and index is not None:
+            index.close()
+        if own_processor and processor is not None:
+            processor.close()
+        if own_journal and journal is not None:
+            journal.close()
+    return downloaded_count, error_count
+
+
+def _journaled(urls, job):
+    """Records URLs in the job's journal as they stream in, dropping ones it already has."""
+    for url in urls:
+        if job.add(url):
+            yield url
+
+
+class _QueryEvents:
+    """Tags one query's events for the batch it belongs to."""
+
+    def __init__(self, batch, query, max_n):
+        self.batch = batch
+        self.query = query
+        self.max_n = max_n
+        self.downloaded = 0
+
+    def put(self, item):
+        message, data = item
+        if message == "log":
+            self.batch.events.put(("log", f"[{self.query}] {data}"))
+        elif message == "progress":
+            # Resumed crawls start from their earlier count, so advance by the difference
+            self.batch.advance(data - self.downloaded)
+            self.downloaded = data
+            self.batch.events.put(("query_progress", (self.query, data, self.max_n)))
+        elif message == "finished":
+            self.batch.events.put(("query_finished", (self.query,) + tuple(data)))
+        elif message == "metrics":
+            # The batch reports one summary for all of its queries
+            pass
+        else:
+            self.batch.events.put(item)
+
+
+class _Batch:
+    def __init__(self, events):
+        self.events = events
+        self.downloaded = 0
+        self.lock = threading.Lock()
+
+    def advance(self, n=1):
+        with self.lock:
+            self.downloaded += n
+            self.events.put(("progress", self.downloaded))
+
+
+def run_batch(queries, options, events, stop_event=None, parallel=BATCH_PARALLEL_QUERIES, metrics=None):
+    """
+    Crawls every query in `queries` with the same options. Up to `parallel`
+    queries search and download at once, and all of them draw from one
+    budget of `options.workers` download slots handed out round-robin, so a
+    query with a slow or huge result set cannot starve the others.
+
+    Besides the run_crawl events, sends ("query_progress", (query, n, max_n))
+    and ("query_finished", (query, downloaded, errors)); "progress" and the
+    final "finished" are totals over the whole batch, and so is the
+    "metrics" summary, collected in `metrics` if given. Returns
+    {query: (downloaded, errors)}, with None for queries whose crawl raised.
+    """
+    stop_event = stop_event or threading.Event()
+    metrics = metrics or Metrics()
+    queries = [q.strip() for q in queries if q.strip()]
+    slots = FairSemaphore(options.workers)
+    # Every query running at once may be waiting on the same search API
+    grow_pools(SESSION, max(options.workers, options.per_host, parallel))
+    index = processor = journal = None
+    batch = _Batch(events)
+    results = {}
+
+    def crawl(query):
+        try:
+            results[query] = run_crawl(
+                query, options, _QueryEvents(batch, query, options.max_n), stop_event, slots, index, processor,
+                journal, metrics,
+            )
+        except Exception:
+            # run_crawl has logged it
+            results[query] = None
+
+    try:
+        index = ImageIndex(options.folder) if options.dedup else None
+        processor = ImageProcessor(options.processes)
+        journal = CrawlJournal(options.folder)
+        with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(queries) or 1))) as executor:
+            list(executor.map(crawl, dict.fromkeys(queries)))
+    except Exception as e:
+        events.put(("log", f"[ERROR] {e}"))
+        raise
+    finally:
+        if not stop_event.is_set():
+            errors = sum(result[1] for result in results.values() if result is not None)
+            events.put(("metrics", metrics.summary()))
+            events.put(("finished", (batch.downloaded, errors)))
+        if index is not None:
+            index.close()
+        if processor is not None:
+            processor.close()
+        if journal is not None:
+            journal.close()
+    return results
+
+
+def fetch_image(img_url, options, log, stop_event, index=None, processor=None, job=None, metrics=None):
+    """
+    Downloads one image and stages it for run_crawl. Transfers are cut
+    short as soon as the response headers or the image header show the
+    image would be thrown away: not an image, too large, too small, or the
+    wrong type under `options.strict_type`. With a JobJournal as `job`,
+    large downloads are spooled to a .part file and resumed from there;
+    the part file is only kept when the crawl is cancelled.
+    Stage timings go to `metrics`.
+    """
+    ftype = options.ftype
+    metrics = metrics or Metrics()
+    if options.https_only and not urlparse(img_url).scheme == "https":
+        return None
+    if _already_downloaded(img_url, index, log):
+        return None
+    part = job.part_path(img_url) if job is not None else None
+    try:
+        body = _download_body(img_url, options, log, stop_event, job, part, metrics)
+        if body is None:
+            return None
+
+        try:
+            with metrics.timer("process"):
+                image = (processor or _INLINE).process(bytes(body), ftype, options.upscale)
+        except BrokenProcessPool as e:
+            raise DownloadError(f"Image worker crashed: {e}")
+        except Exception as e:
+            raise DownloadError(f"Not a valid image: {e}")
+        for stage, seconds in image.timings.items():
+            metrics.observe(stage, seconds)
+        if image.new_size:
+            log(f"Upscaled image to {image.new_size} for {img_url[:70]}...")
+        if ftype != "any" and image.source_ext != ftype:
+            log(f"Type mismatch: Detected {image.source_ext}, saving as {ftype} for {img_url[:70]}...")
+        if _claim_duplicate(img_url, image.sha256, image.phash, index, log):
+            return None
+
+        tmp = _temp_path(options.folder)
+        try:
+            with metrics.timer("write"), open(tmp, 'wb') as f:
+                f.write(image.data)
+        except Exception as e:
+            _remove(tmp)
+            if index is not None:
+                index.release(image.sha256)
+            raise DownloadError(f"Save error: {e}")
+        return Staged(tmp, image.ext, image.thumb, img_url, image.sha256, image.phash)
+    finally:
+        # A cancelled transfer is resumed next run, anything else is done with its part
+        if part is not None and not stop_event.is_set():
+            _remove(part)
+
+
+def _download_body(img_url, options, log, stop_event, job, part, metrics):
+    """
+    Returns the response body, or None if the image was rejected on the way.
+    Bodies past RESUME_MIN_BYTES are spooled to `part` if the server sent a
+    validator that a later Range request can check with If-Range.
+    """
+    headers = {
+        'User-Agent': 'Mozilla/5.0',
+        'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+        'Referer': img_url
+    }
+    offset, validator = (job.partial(img_url) if job is not None else None) or (0, None)
+    if offset:
+        headers['Range'] = f"bytes={offset}-"
+        # The server answers 200 with the whole body if the image changed since
+        headers['If-Range'] = validator
+    spool = None
+    spooled = synced = received = 0
+
+    def reject(reason):
+        if spool is not None:
+            spool.close()
+        return _reject(img_url, reason, log)
+
+    try:
+        resp = SESSION.get(img_url, headers=headers, timeout=15, stream=True)
+        if resp.timings["connect"]:
+            metrics.observe("connect", resp.timings["connect"])
+        if resp.timings["ttfb"] is not None:
+            metrics.observe("ttfb", resp.timings["ttfb"])
+        started = time.perf_counter()
+        with resp:
+            total = resp.headers.get("Content-Length", "")
+            total = int(total) if total.isdigit() else None
+            content_range = resp.headers.get("Content-Range", "")
+            if offset and resp.status_code == 206 and content_range.startswith(f"bytes {offset}-"):
+                with open(part, 'rb') as f:
+                    body = bytearray(f.read(offset))
+                spooled = synced = len(body)
+                size = content_range.rpartition("/")[2]
+                total = int(size) if size.isdigit() else None
+                log(f"[DEBUG] Resuming at {offset // 1024} KB: {img_url[:70]}...")
+            elif resp.status_code == 200:
+                body = bytearray()
+                validator = _validator(resp.headers)
+            else:
+                raise DownloadError(f"HTTP {resp.status_code}", resp.status_code)
+            content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type and not content_type.startswith("image/") and "octet-stream" not in content_type:
+                raise DownloadError(f"Not an image ({content_type})")
+            if total is not None and total > options.max_bytes:
+                return reject(f"{total // 1024} KB is over the size limit")
+
+            sniffer = HeaderSniffer()
+            if body:
+                # A resumed download already passed the header checks
+                sniffer.feed(bytes(body))
+            for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+                if stop_event.is_set():
+                    raise DownloadError("Cancelled")
+                received += len(chunk)
+                body += chunk
+                if len(body) > options.max_bytes:
+                    return reject(f"over {options.max_bytes // 1024} KB")
+                if sniffer.size is None:
+                    try:
+                        known = sniffer.feed(chunk)
+                    except Exception as e:
+                        raise DownloadError(f"Not a valid image: {e}")
+                    if known:
+                        reason = _header_rejection(sniffer, options)
+                        if reason:
+                            return reject(reason)
+                    elif len(body) > SNIFF_LIMIT:
+                        raise DownloadError("Not a valid image: unknown format")
+                if part is not None and validator and len(body) >= RESUME_MIN_BYTES:
+                    if spool is None:
+                        os.makedirs(os.path.dirname(part), exist_ok=True)
+                        spool = open(part, 'r+b' if spooled else 'wb')
+                        spool.seek(spooled)
+                        spool.truncate()
+                    spool.write(body[spooled:])
+                    spooled = len(body)
+                    if spooled - synced >= RESUME_SYNC_BYTES:
+                        spool.flush()
+                        job.progress(img_url, spooled, part, validator)
+                        synced = spooled
+            metrics.observe("transfer", time.perf_counter() - started)
+    except requests.RequestException as e:
+        raise DownloadError(f"Download error: {e}")
+    finally:
+        # Whatever made it to disk can be resumed next time
+        if spool is not None and not spool.closed:
+            spool.close()
+            job.progress(img_url, spooled, part, validator)
+        if received:
+            metrics.count("bytes", received)
+    return body
+
+
+def _error_category(err):
+    """Groups a download error for the error counters."""
+    cause = err.__cause__ or err.__context__
+    if getattr(err, "status", None):
+        return f"http_{err.status}"
+    if isinstance(cause, requests.Timeout):
+        return "timeout"
+    if isinstance(cause, requests.ConnectionError):
+        return "connection"
+    return type(cause or err).__name__
+
+
+def _header_rejection(sniffer, options):
+    width, height = sniffer.size
+    if width < options.min_width or height < options.min_height:
+        return f"{width}x{height} is below {options.min_width}x{options.min_height}"
+    if options.strict_type and options.ftype != "any" and sniffer.ext != options.ftype:
+        return f"{sniffer.ext} is not {options.ftype}"
+    return None
+
+
+def _reject(img_url, reason, log):
+    # Returning from inside `with resp` closes the connection, aborting the transfer
+    log(f"Rejected: {img_url[:70]}... | {reason}")
+    return None
+
+
+def _validator(headers):
+    """The ETag or Last-Modified an If-Range can check a resumed download against."""
+    etag = headers.get("ETag", "")
+    # If-Range only takes strong ETags
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _already_downloaded(img_url, index, log):
+    if index is not None and index.has_url(img_url):
+        log(f"[DEBUG] Already downloaded: {img_url[:70]}...")
+        return True
+    return False
+
+
+def _claim_duplicate(img_url, sha, phash, index, log):
+    """True if the image is already in the index, otherwise reserves it."""
+    if index is None:
+        return False
+    existing = index.claim(sha, phash)
+    if existing:
+        log(f"[DEBUG] Duplicate of {os.path.basename(existing)}: {img_url[:70]}...")
+        return True
+    return False
+
+
+def _taken_numbers(folder, stem):
+    """The n of every {stem}_{n}.* file in the folder; a number is taken whatever format it was saved in."""
+    pattern = re.compile(re.escape(stem) + r"_(\d+)\..+")
+    with os.scandir(folder) as entries:
+        matches = (pattern.fullmatch(entry.name) for entry in entries)
+        return {int(m.group(1)) for m in matches if m}
+
+
+def _free_path(folder, stem, number, ext, taken):
+    """The next number after `number` that isn't in `taken`, which it is then added to, and its path."""
+    number += 1
+    while number in taken:
+        number += 1
+    taken.add(number)
+    return number, os.path.join(folder, f"{stem}_{number}.{ext}")
+
+
+def _temp_path(folder):
+    return os.path.join(folder, f".{uuid.uuid4().hex}.part")
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
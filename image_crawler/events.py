@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class CoalescingEvents:
+    """
+    Sits between the engine and a slow consumer such as a GUI queue and
+    forwards events in batches at most every `interval` seconds: log lines
+    as one ("logs", [lines]) event, thumbnails as one ("thumbnails", [png])
+    event, and only the latest "progress" / per-query "query_progress".
+    Anything else ("finished", "query_finished") flushes what is buffered
+    and is forwarded straight away, so ordering is kept.
+    """
+
+    def __init__(self, target, interval=0.1):
+        self.target = target
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._logs = []
+        self._thumbnails = []
+        self._progress = None
+        self._query_progress = {}
+        self._last_flush = 0.0
+        self._timer = None
+
+    def put(self, item):
+        message, data = item
+        with self._lock:
+            if message == "log":
+                self._logs.append(data)
+            elif message == "thumbnail":
+                self._thumbnails.append(data)
+            elif message == "progress":
+                self._progress = data
+            elif message == "query_progress":
+                self._query_progress[data[0]] = data
+            else:
+                self._flush_locked()
+                self.target.put(item)
+                return
+            due = self._last_flush + self.interval - time.monotonic()
+            if due <= 0:
+                self._flush_locked()
+            elif self._timer is None:
+                # Deliver the tail of a burst even if the engine then goes quiet
+                self._timer = threading.Timer(due, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._last_flush = time.monotonic()
+        if self._logs:
+            self.target.put(("logs", self._logs))
+            self._logs = []
+        for data in self._query_progress.values():
+            self.target.put(("query_progress", data))
+        self._query_progress = {}
+        if self._progress is not None:
+            self.target.put(("progress", self._progress))
+            self._progress = None
+        if self._thumbnails:
+            self.target.put(("thumbnails", self._thumbnails))
+            self._thumbnails = []
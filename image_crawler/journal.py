@@ -0,0 +1,183 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from .config import RESUME_PARTS_DIR
+
+PENDING, DONE, FAILED, SKIPPED = "pending", "done", "failed", "skipped"
+
+
+class CrawlJournal:
+    """
+    On-disk record of the crawls run into one output folder: the URLs each
+    (query, engine) job has taken from its search so far and, per URL, its
+    state, bytes received so far, partial file and output path. A job that
+    was cancelled or crashed can be resumed without searching again or
+    redoing finished URLs, and large half-finished downloads continue from
+    their .part file under `parts_dir`, which is local disk by default.
+    Safe to share between threads.
+    """
+
+    FILENAME = ".crawl_journal.sqlite"
+
+    def __init__(self, folder, parts_dir=RESUME_PARTS_DIR):
+        self.folder = folder
+        self.parts_dir = parts_dir
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(folder, self.FILENAME), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                query TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                created REAL NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (query, engine)
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                query TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                part_path TEXT,
+                validator TEXT,
+                output_path TEXT,
+                error TEXT,
+                PRIMARY KEY (query, engine, url)
+            );
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(urls)")}
+        if "validator" not in columns:
+            self._db.execute("ALTER TABLE urls ADD COLUMN validator TEXT")
+            self._db.commit()
+
+    def job(self, query, engine):
+        return JobJournal(self, query, engine)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, params=(), many=False):
+        with self._lock:
+            cur = self._db.executemany(sql, params) if many else self._db.execute(sql, params)
+            rows = cur.fetchall()
+            self._db.commit()
+            return rows
+
+    def _modify(self, sql, params=()):
+        """Like _execute, but returns the number of rows changed."""
+        with self._lock:
+            count = self._db.execute(sql, params).rowcount
+            self._db.commit()
+            return count
+
+
+class JobJournal:
+    """The journal of one (query, engine) crawl."""
+
+    def __init__(self, journal, query, engine):
+        self.journal = journal
+        self.key = (query, engine)
+
+    def resume_urls(self):
+        """
+        URLs still to try if this job was left unfinished, pending ones
+        first and previously failed ones after; None if there is nothing
+        to resume.
+        """
+        row = self.journal._execute("SELECT finished FROM jobs WHERE query = ? AND engine = ?", self.key)
+        if not row or row[0][0]:
+            return None
+        rows = self.journal._execute(
+            "SELECT url FROM urls WHERE query = ? AND engine = ? AND state IN (?, ?) "
+            "ORDER BY state = ?, position",
+            self.key + (PENDING, FAILED, FAILED),
+        )
+        return [url for url, in rows]
+
+    def done_count(self):
+        return self.journal._execute(
+            "SELECT COUNT(*) FROM urls WHERE query = ? AND engine = ? AND state = ?", self.key + (DONE,)
+        )[0][0]
+
+    def url_count(self):
+        """Number of URLs the job has taken from its search, in any state."""
+        return self.journal._execute("SELECT COUNT(*) FROM urls WHERE query = ? AND engine = ?", self.key)[0][0]
+
+    def start(self):
+        """Starts the job over with an empty URL list."""
+        parts = self.journal._execute(
+            "SELECT part_path FROM urls WHERE query = ? AND engine = ? AND part_path IS NOT NULL", self.key
+        )
+        for part, in parts:
+            if os.path.exists(part):
+                os.remove(part)
+        self.journal._execute("DELETE FROM urls WHERE query = ? AND engine = ?", self.key)
+        self.journal._execute(
+            "INSERT OR REPLACE INTO jobs (query, engine, created, finished) VALUES (?, ?, ?, 0)",
+            self.key + (time.time(),),
+        )
+
+    def add(self, url):
+        """
+        Appends a URL as the search streams it in. Returns False if the job
+        already knows it, e.g. from before a resume.
+        """
+        return self.journal._modify(
+            "INSERT OR IGNORE INTO urls (query, engine, position, url, state) "
+            "SELECT ?, ?, COALESCE(MAX(position) + 1, 0), ?, ? FROM urls WHERE query = ? AND engine = ?",
+            self.key + (url, PENDING) + self.key,
+        ) > 0
+
+    def part_path(self, url):
+        """
+        Where a large download of `url` is spooled so it can be resumed;
+        separate per output folder and job, so crawls sharing a URL don't
+        write to the same file.
+        """
+        key = "\n".join((os.path.abspath(self.journal.folder),) + self.key + (url,))
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.journal.parts_dir, f"{name}.part")
+
+    def partial(self, url):
+        """
+        (bytes, validator) of a download of `url` that can be resumed: its
+        part file holds at least the bytes last recorded, and the response
+        had an ETag or Last-Modified to send as If-Range. None otherwise.
+        """
+        rows = self.journal._execute(
+            "SELECT bytes, part_path, validator FROM urls WHERE query = ? AND engine = ? AND url = ?",
+            self.key + (url,),
+        )
+        if not rows:
+            return None
+        received, part, validator = rows[0]
+        if not (received and part and validator) or not os.path.exists(part) or os.path.getsize(part) < received:
+            return None
+        return received, validator
+
+    def progress(self, url, received, part_path, validator):
+        self._update(url, bytes=received, part_path=part_path, validator=validator)
+
+    def done(self, url, output_path):
+        self._update(url, state=DONE, output_path=output_path, bytes=0, part_path=None, error=None)
+
+    def failed(self, url, error):
+        self._update(url, state=FAILED, bytes=0, part_path=None, error=str(error))
+
+    def skipped(self, url):
+        self._update(url, state=SKIPPED, bytes=0, part_path=None)
+
+    def finish(self):
+        self.journal._execute("UPDATE jobs SET finished = 1 WHERE query = ? AND engine = ?", self.key)
+
+    def _update(self, url, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self.journal._execute(
+            f"UPDATE urls SET {columns} WHERE query = ? AND engine = ? AND url = ?",
+            tuple(fields.values()) + self.key + (url,),
+        )
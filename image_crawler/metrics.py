@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Stages timed by the engine, in pipeline order
+STAGES = (
+    "search_page", "connect", "ttfb", "transfer", "process", "decode", "hash", "resize", "encode", "thumbnail", "write",
+)
+_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Metrics:
+    """
+    Per-stage timings and counters for one run, safe to share between
+    threads and between the queries of a batch.
+
+    Stages (seconds each): search_page (from sending an uncached search
+    request to its response headers, including connection setup but not
+    rate limiter waits), connect (opening a new connection for an image
+    request: DNS, TCP and TLS) and ttfb (from sending the last attempt of
+    an image request to its response headers, without connection setup
+    or retry backoff),
+    transfer (reading the body), process (the whole process_image call,
+    including the trip to the worker process) split into decode, hash,
+    resize, encode and thumbnail, and write (the image file). Counters
+    include bytes, images, skipped, search_cache_hits and
+    errors.<category>, where the category is http_<status>, timeout,
+    connection or the exception name.
+
+    With `sink`, a writable text file, every sample is also written as a
+    JSON line when it is recorded.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._timings = defaultdict(list)
+        self._counters = Counter()
+
+    def observe(self, stage, seconds, **labels):
+        with self._lock:
+            self._timings[stage].append(seconds)
+            if self.sink is not None:
+                self._write(dict(stage=stage, seconds=round(seconds, 6), **labels))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+            if self.sink is not None:
+                self._write({"counter": name, "n": n})
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def _write(self, record):
+        record["t"] = round(time.time(), 3)
+        self.sink.write(json.dumps(record) + "\n")
+
+    def summary(self):
+        """Everything collected so far as a plain dict."""
+        with self._lock:
+            timings = {stage: sorted(values) for stage, values in self._timings.items()}
+            counters = dict(self._counters)
+        elapsed = time.monotonic() - self.started
+        stages = {}
+        for stage in sorted(timings, key=_stage_order):
+            values = timings[stage]
+            stages[stage] = {
+                "count": len(values),
+                "total": sum(values),
+                "mean": sum(values) / len(values),
+                **{f"p{int(q * 100)}": _quantile(values, q) for q in _QUANTILES},
+                "max": values[-1],
+            }
+        return {
+            "elapsed": elapsed,
+            "images_per_sec": counters.get("images", 0) / elapsed if elapsed > 0 else 0.0,
+            "bytes_per_sec": counters.get("bytes", 0) / elapsed if elapsed > 0 else 0.0,
+            "counters": counters,
+            "stages": stages,
+        }
+
+    def write_summary(self):
+        """Appends the summary to the JSON-lines sink, if there is one."""
+        if self.sink is not None:
+            summary = self.summary()
+            with self._lock:
+                self._write({"summary": summary})
+                self.sink.flush()
+
+    def prometheus(self, prefix="image_crawler"):
+        """The summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = [
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, s in summary["stages"].items():
+            for q in _QUANTILES:
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q}"}} {s[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {s["total"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+        counters = summary["counters"]
+        errors = {name[len("errors."):]: n for name, n in counters.items() if name.startswith("errors.")}
+        if errors:
+            lines.append(f"# TYPE {prefix}_errors_total counter")
+            lines.extend(f'{prefix}_errors_total{{category="{c}"}} {n}' for c, n in sorted(errors.items()))
+        for name, n in sorted(counters.items()):
+            if not name.startswith("errors."):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {n}")
+        lines.append(f"# TYPE {prefix}_elapsed_seconds gauge")
+        lines.append(f"{prefix}_elapsed_seconds {summary['elapsed']:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+def format_summary(summary):
+    """Human-readable lines for a Metrics.summary()."""
+    counters = summary["counters"]
+    lines = [
+        f"{counters.get('images', 0)} images in {summary['elapsed']:.1f}s "
+        f"({summary['images_per_sec']:.2f}/s, {summary['bytes_per_sec'] / 1024 / 1024:.2f} MB/s, "
+        f"{counters.get('bytes', 0) / 1024 / 1024:.1f} MB)"
+    ]
+    for stage, s in summary["stages"].items():
+        lines.append(
+            f"  {stage:<12} n={s['count']:<5} mean={s['mean'] * 1000:8.1f}ms p50={s['p50'] * 1000:8.1f}ms "
+            f"p99={s['p99'] * 1000:8.1f}ms total={s['total']:7.2f}s"
+        )
+    errors = sorted((n, name[len("errors."):]) for name, n in counters.items() if name.startswith("errors."))
+    if errors:
+        lines.append("  errors: " + ", ".join(f"{name}={n}" for n, name in reversed(errors)))
+    if counters.get("skipped"):
+        lines.append(f"  skipped: {counters['skipped']}")
+    return lines
+
+
+def _quantile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
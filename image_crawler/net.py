@@ -0,0 +1,157 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .config import DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST, HTTP_RETRIES, HTTP_BACKOFF, RATE_LIMIT_MAX_WAIT
+from .ratelimit import RateLimiter, THROTTLED, _retry_after
+
+# Connect and ttfb seconds of the request in flight on this thread
+_timing = threading.local()
+
+
+class _TimedConnection:
+    """Records connection setup and time to first byte in _timing."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _timing.connect += time.perf_counter() - started
+
+    def request(self, *args, **kwargs):
+        # Plain HTTP connects lazily, inside the request
+        _timing.sent = (time.perf_counter(), _timing.connect)
+        super().request(*args, **kwargs)
+
+    def getresponse(self):
+        resp = super().getresponse()
+        sent, connect = _timing.sent
+        _timing.ttfb = time.perf_counter() - sent - (_timing.connect - connect)
+        return resp
+
+
+class _TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that sets `resp.timings` on every response: "connect" is
+    the time spent opening new connections (DNS, TCP and TLS; 0.0 when a
+    kept-alive one was reused) and "ttfb" the time from sending the last
+    attempt to its response headers. urllib3 retry backoff sleeps are in
+    neither. Requests through a proxy get a ttfb of None.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        _timing.connect, _timing.ttfb = 0.0, None
+        resp = super().send(request, *args, **kwargs)
+        resp.timings = {"connect": _timing.connect, "ttfb": _timing.ttfb}
+        return resp
+
+
+class RateLimitedSession(requests.Session):
+    """
+    Session whose requests each wait for a token from `limiter` and report
+    back to it. Throttled responses (429/503) are retried here, not by
+    urllib3, up to `retries` times: every attempt waits on the limiter
+    again, so the Retry-After pause observe() put on the host (capped at
+    RATE_LIMIT_MAX_WAIT) and its lowered rate hold for the retry too.
+    """
+
+    def __init__(self, limiter, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+        super().__init__()
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+
+    def request(self, method, url, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.limiter.wait(url)
+            resp = super().request(method, url, *args, **kwargs)
+            self.limiter.observe(url, resp)
+            if resp.status_code not in THROTTLED or attempt >= self.retries or method.upper() not in ("GET", "HEAD"):
+                return resp
+            resp.close()
+            if self.limiter.bucket(urlparse(url).netloc) is None:
+                # Unlimited hosts have no bucket to pause, so wait here
+                delay = _retry_after(resp.headers.get("Retry-After")) or self.backoff * 2 ** attempt
+                time.sleep(min(delay, RATE_LIMIT_MAX_WAIT))
+            attempt += 1
+
+
+def make_session(
+    pool_size=max(DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST), retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, limiter=None
+):
+    """
+    Keep-alive session shared by every request. Each host gets a connection
+    pool of `pool_size` (see grow_pools). Dropped connections and 5xx
+    errors are retried by urllib3 with exponential backoff; 429/503 are
+    retried by RateLimitedSession, honoring Retry-After through `limiter`.
+    Without a limiter hosts are not rate limited, but Retry-After still is.
+    Responses carry connect and ttfb timings (see TimedHTTPAdapter).
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        # 429 and 503 are left to RateLimitedSession
+        status_forcelist=(500, 502, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = TimedHTTPAdapter(pool_connections=32, pool_maxsize=max(1, pool_size), max_retries=retry)
+    session = RateLimitedSession(limiter if limiter is not None else RateLimiter(0), retries, backoff)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_pools_lock = threading.Lock()
+
+
+def grow_pools(session, size):
+    """
+    Makes sure the session keeps up to `size` connections per host alive,
+    for crawls with more workers (or batches with more parallel queries)
+    than the pools were sized for. Pools are only ever grown.
+    """
+    with _pools_lock:
+        for adapter in set(session.adapters.values()):
+            if isinstance(adapter, HTTPAdapter) and adapter._pool_maxsize < size:
+                # Connections in flight go back to the old pools and are dropped with them
+                adapter.init_poolmanager(adapter._pool_connections, size, block=adapter._pool_block)
+
+
+# Search backends set their API hosts' rates on registration
+RATE_LIMITER = RateLimiter()
+SESSION = make_session(limiter=RATE_LIMITER)
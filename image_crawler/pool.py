@@ -0,0 +1,232 @@
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+from .config import DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST
+
+
+class FairSemaphore:
+    """
+    Counting semaphore that grants slots strictly in request order. When
+    several downloaders share one, each asks for a single slot at a time,
+    so freed slots rotate round-robin between them instead of going to
+    whichever thread wakes up first.
+    """
+
+    def __init__(self, slots):
+        self._cond = threading.Condition()
+        self._free = max(1, slots)
+        self._waiting = deque()
+
+    def acquire(self, stop_event=None):
+        """Blocks until a slot is granted. Returns False if stop_event fires first."""
+        ticket = object()
+        with self._cond:
+            self._waiting.append(ticket)
+            while self._free <= 0 or self._waiting[0] is not ticket:
+                if stop_event is not None and stop_event.is_set():
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(0.5)
+            self._waiting.popleft()
+            self._free -= 1
+            self._cond.notify_all()
+            return True
+
+    def release(self):
+        with self._cond:
+            self._free += 1
+            self._cond.notify_all()
+
+
+class Prefetcher:
+    """
+    Pulls items from an iterable (typically a lazy search) on a background
+    thread, but only as the consumer asks for them: with want(n) ahead of
+    time, or by a poll() that finds nothing waiting, and at most `ahead`
+    items beyond that. A paged search therefore requests its
+    next page only once the consumer wants a result from it, while the
+    consumer itself never blocks on the request. An exception raised by the
+    iterable is re-raised to the consumer once the items before it have
+    been taken.
+    """
+
+    EMPTY = object()
+    _END = object()
+
+    def __init__(self, iterable, ahead=0, stop_event=None):
+        self.exhausted = False
+        self.ahead = max(0, ahead)
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._wanted = 0
+        self._pulled = 0
+        self._taken = 0
+        self._stop_event = stop_event or threading.Event()
+        self._closed = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(iterable,), daemon=True)
+        self._thread.start()
+
+    def _run(self, iterable):
+        it = iter(iterable)
+        try:
+            while self._wait_for_demand():
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                with self._cond:
+                    self._pulled += 1
+                self._queue.put(item)
+        except Exception as e:
+            self._error = e
+        finally:
+            # Close generators here, on the thread that has been running them
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+            self._queue.put(self._END)
+
+    def _stopped(self):
+        return self._closed.is_set() or self._stop_event.is_set()
+
+    def _wait_for_demand(self):
+        with self._cond:
+            while self._pulled >= self._wanted + self.ahead and not self._stopped():
+                self._cond.wait(0.5)
+            return not self._stopped()
+
+    def want(self, n):
+        """Asks for up to `n` items beyond those already taken to be fetched in the background."""
+        with self._cond:
+            if self._taken + n > self._wanted:
+                self._wanted = self._taken + n
+                self._cond.notify_all()
+
+    def poll(self, timeout=None):
+        """
+        The next item, or EMPTY if none arrived within `timeout` seconds
+        (None waits indefinitely) or the iterable is exhausted.
+        """
+        if self.exhausted:
+            return self.EMPTY
+        self.want(1)
+        try:
+            item = self._queue.get(timeout=timeout) if timeout != 0 else self._queue.get_nowait()
+        except queue.Empty:
+            return self.EMPTY
+        if item is self._END:
+            self.exhausted = True
+            if self._error is not None:
+                raise self._error
+            return self.EMPTY
+        self._taken += 1
+        return item
+
+    def close(self):
+        """Stops the producer; it finishes whatever item it is busy fetching."""
+        self._closed.set()
+        with self._cond:
+            self._cond.notify_all()
+
+
+class ConcurrentDownloader:
+    """
+    Runs download jobs on a bounded thread pool, with at most `per_host`
+    jobs in flight against the same host. Downloaders that share a
+    FairSemaphore as `slots` also share one global concurrency budget.
+    """
+
+    def __init__(self, workers=DOWNLOAD_WORKERS, per_host=DOWNLOAD_PER_HOST, stop_event=None, slots=None):
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.stop_event = stop_event or threading.Event()
+        self.slots = slots
+
+    def imap(self, job, urls, max_n, discard=None):
+        """
+        Yields (url, result, error) as jobs finish. A job returns None to skip a
+        URL or raises to report an error. Never keeps more jobs in flight than
+        are still needed to reach max_n results; results that arrive after the
+        caller stopped consuming are handed to `discard`.
+
+        `urls` is consumed lazily through a Prefetcher, which fetches URLs
+        in the background only as far as they could still be needed for
+        max_n, counting jobs running and URLs held back: a paged search
+        passed as a generator only fetches another page once failures or
+        skips leave the results short.
+        """
+        feed = Prefetcher(urls, 0, self.stop_event)
+        # URLs taken from the feed but held back by the per-host cap
+        pending = deque()
+        lookahead = self.workers
+        running = {}
+        host_load = Counter()
+        succeeded = 0
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while not self.stop_event.is_set():
+                limit = min(self.workers, max_n - succeeded)
+                # Have the feed fetch what may still be needed, so free slots don't wait on it
+                feed.want(min(lookahead, max_n - succeeded - len(running) - len(pending)))
+                while len(running) < limit:
+                    url = self._next_url(pending, host_load)
+                    if url is None:
+                        wanted = max_n - succeeded - len(running)
+                        if feed.exhausted or len(pending) >= min(lookahead, wanted):
+                            break
+                        # Don't sit waiting on the next search page while jobs are finishing
+                        url = feed.poll(0 if running else 0.5)
+                        if url is Prefetcher.EMPTY:
+                            break
+                        pending.append(url)
+                        continue
+                    if self.slots is not None and not self.slots.acquire(self.stop_event):
+                        pending.appendleft(url)
+                        break
+                    host = urlparse(url).netloc
+                    host_load[host] += 1
+                    fut = executor.submit(job, url)
+                    if self.slots is not None:
+                        # Free the slot as soon as the job ends, not when we get
+                        # round to reaping it, or blocked lanes could starve each other
+                        fut.add_done_callback(lambda f: self.slots.release())
+                    running[fut] = (url, host)
+                if not running:
+                    if limit <= 0 or (feed.exhausted and not pending):
+                        break
+                    continue
+                done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    url, host = running.pop(fut)
+                    host_load[host] -= 1
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        yield url, None, e
+                        continue
+                    if result is not None:
+                        succeeded += 1
+                    yield url, result, None
+        finally:
+            feed.close()
+            for fut in running:
+                if discard is not None:
+                    fut.add_done_callback(lambda f: _discard_result(f, discard))
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _next_url(self, pending, host_load):
+        for i, url in enumerate(pending):
+            if host_load[urlparse(url).netloc] < self.per_host:
+                del pending[i]
+                return url
+        return None
+
+
+def _discard_result(fut, discard):
+    if not fut.cancelled() and fut.exception() is None and fut.result() is not None:
+        discard(fut.result())
@@ -0,0 +1,177 @@
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from PIL import Image, ImageFile
+
+from .config import TARGET_MIN_WIDTH, TARGET_MIN_HEIGHT, IMAGE_PROCESSES
+from .dedup import dhash
+
+THUMBNAIL_SIZE = (100, 100)
+
+# Pillow format name -> file extension we save under
+# MPO (multi-picture JPEG, as saved by many phone cameras) is read and saved as JPEG
+_EXTENSIONS = {"JPEG": "jpg", "MPO": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp", "BMP": "bmp", "TIFF": "tif"}
+_FORMATS = {
+    "jpg": "JPEG", "jpeg": "JPEG", "mpo": "JPEG", "png": "PNG", "gif": "GIF", "webp": "WEBP", "bmp": "BMP",
+    "tif": "TIFF",
+}
+
+# data: bytes to write, ext: extension to save under, thumb: PNG thumbnail,
+# source_ext: detected format, new_size: size after upscaling or None,
+# timings: {stage: seconds} for decode, hash, resize, encode and thumbnail
+ProcessedImage = namedtuple("ProcessedImage", "data ext thumb sha256 phash source_ext new_size timings")
+
+
+class HeaderSniffer:
+    """
+    Works out an image's format and dimensions from the first bytes of a
+    download, before the rest arrives. Feed chunks in order until feed()
+    returns True; only the header is parsed, pixel data is not decoded.
+    """
+
+    def __init__(self):
+        self._parser = ImageFile.Parser()
+        self._head = b""
+        self.format = None
+        self.ext = None
+        self.size = None
+
+    def feed(self, chunk):
+        if self.size is None:
+            if len(self._head) < 30:
+                self._head += chunk[:30]
+            self._parser.feed(chunk)
+            img = self._parser.image
+            if img is not None:
+                self.format = img.format
+                self.ext = _EXTENSIONS.get(img.format, (img.format or "").lower())
+                self.size = img.size
+            else:
+                # Pillow's WebP plugin only opens complete files, so read the header ourselves
+                size = _webp_size(self._head)
+                if size is not None:
+                    self.format, self.ext, self.size = "WEBP", "webp", size
+        return self.size is not None
+
+
+def _webp_size(head):
+    if len(head) < 30 or head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        return int.from_bytes(head[26:28], "little") & 0x3FFF, int.from_bytes(head[28:30], "little") & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def process_image(data, ftype="any", upscale=True):
+    """
+    Turns downloaded bytes into the bytes to write, in one pass over one
+    decoded image: validates by decoding, upscales anything smaller than
+    the target size (unless `upscale` is off), converts to `ftype` unless it
+    is "any", and builds the thumbnail. When neither resize nor conversion
+    is needed the original bytes are returned untouched, so nothing is
+    re-encoded. Raises on data Pillow cannot decode.
+    """
+    timings = {}
+    clock = time.perf_counter()
+
+    def lap(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = now - clock
+        clock = now
+
+    img = Image.open(BytesIO(data))
+    # load() decodes the whole image, so truncated or corrupt files fail here
+    img.load()
+    source_fmt = img.format or "JPEG"
+    source_ext = _EXTENSIONS.get(source_fmt, source_fmt.lower())
+    lap("decode")
+    sha = hashlib.sha256(data).hexdigest()
+    phash = dhash(img)
+    lap("hash")
+
+    img, new_size = _upscale(img) if upscale else (img, None)
+    lap("resize")
+    ext = source_ext if ftype == "any" else ftype
+    target_fmt = _FORMATS.get(ext, source_fmt)
+    if new_size is None and target_fmt == _FORMATS.get(source_ext, source_fmt):
+        out = data
+    else:
+        out = _encode(img, target_fmt)
+    lap("encode")
+
+    thumb = img.copy()
+    thumb.thumbnail(THUMBNAIL_SIZE)
+    thumb = _encode(thumb, "PNG")
+    lap("thumbnail")
+    return ProcessedImage(out, ext, thumb, sha, phash, source_ext, new_size, timings)
+
+
+def _encode(img, fmt):
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif fmt == "PNG" and img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"):
+        img = img.convert("RGBA")
+    buf = BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _upscale(img):
+    if img.width < TARGET_MIN_WIDTH or img.height < TARGET_MIN_HEIGHT:
+        scale = max(TARGET_MIN_WIDTH / img.width, TARGET_MIN_HEIGHT / img.height)
+        new_size = (int(img.width * scale), int(img.height * scale))
+        return img.resize(new_size, Image.LANCZOS), new_size
+    return img, None
+
+
+class ImageProcessor:
+    """
+    Runs process_image on a pool of `processes` worker processes, so
+    decoding and resizing use every core while the download threads keep
+    fetching. With `processes` set to 0 images are processed inline in the
+    calling thread. The pool is started on first use.
+    """
+
+    def __init__(self, processes=IMAGE_PROCESSES):
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def process(self, data, ftype="any", upscale=True):
+        if self.processes <= 0:
+            return process_image(data, ftype, upscale)
+        executor = self._pool()
+        try:
+            return executor.submit(process_image, data, ftype, upscale).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory on a huge image); start a fresh pool next time
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that already runs threads (and maybe Tk) is unsafe
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
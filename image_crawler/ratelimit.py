@@ -0,0 +1,161 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from .config import RATE_LIMIT_PER_HOST, RATE_LIMIT_BURST, RATE_LIMIT_MAX_WAIT
+
+# Statuses that mean "you're going too fast"
+THROTTLED = (429, 503)
+
+
+class TokenBucket:
+    """
+    Lets requests through at `rate` per second on average, in bursts of up
+    to `burst`. The rate adapts AIMD-style: slow_down() halves it (down to
+    1/16 of the configured rate) and each unthrottled response wins back
+    1/16, so a host that pushes back is probed again gently.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.ceiling = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may go out."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + max(0.0, now - self._stamp) * self.rate)
+                self._stamp = max(self._stamp, now)
+                if self._tokens >= 1 and now >= self._stamp:
+                    self._tokens -= 1
+                    return
+                wait = max(self._stamp - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds every request back for `seconds` (capped at RATE_LIMIT_MAX_WAIT)."""
+        with self._lock:
+            self._tokens = 0.0
+            self._stamp = max(self._stamp, time.monotonic() + min(seconds, RATE_LIMIT_MAX_WAIT))
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.ceiling / 16, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.ceiling, self.rate + self.ceiling / 16)
+
+
+class RateLimiter:
+    """
+    One TokenBucket per host, created on first use at `default_rate`
+    requests per second; configure() gives a host (an API, the scrape
+    target) its own rate. A rate of 0 leaves the host unlimited.
+    Responses fed to observe() adapt the host's rate: 429/503 halve it
+    and pause the host for its Retry-After, and X-RateLimit-Remaining
+    running low slows it down before the quota runs out.
+    """
+
+    def __init__(self, default_rate=RATE_LIMIT_PER_HOST, burst=RATE_LIMIT_BURST):
+        self.default_rate = default_rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host, rate, burst=1):
+        with self._lock:
+            self._buckets[host] = TokenBucket(rate, burst) if rate > 0 else None
+
+    def bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                rate = self.default_rate
+                self._buckets[host] = TokenBucket(rate, self.burst) if rate > 0 else None
+            return self._buckets[host]
+
+    def wait(self, url):
+        bucket = self.bucket(urlparse(url).netloc)
+        if bucket is not None:
+            bucket.acquire()
+
+    def observe(self, url, resp):
+        bucket = self.bucket(urlparse(url).netloc)
+        if bucket is None:
+            return
+        if resp.status_code in THROTTLED:
+            bucket.slow_down()
+            bucket.pause(_retry_after(resp.headers.get("Retry-After")) or 1.0)
+        else:
+            bucket.speed_up()
+        remaining = _int_header(resp.headers, "X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        limit = _int_header(resp.headers, "X-RateLimit-Limit")
+        if remaining <= 0:
+            reset = _reset_after(resp.headers.get("X-RateLimit-Reset"))
+            if reset:
+                bucket.pause(reset)
+            bucket.slow_down()
+        elif limit and remaining < limit / 10:
+            bucket.slow_down()
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _reset_after(value):
+    """Seconds until an X-RateLimit-Reset, which APIs send as a delay or an epoch time."""
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, reset - time.time()) if reset > 1e9 else reset
+
+
+def robots_delay(session, base_url, agent="*"):
+    """
+    Seconds between requests asked for by the site's robots.txt
+    (Crawl-delay, or Request-rate), or None if it asks for nothing or
+    can't be fetched.
+    """
+    try:
+        resp = session.get(base_url.rstrip("/") + "/robots.txt", timeout=10)
+    except Exception:
+        return None
+    if resp.status_code != 200:
+        return None
+    parser = RobotFileParser()
+    parser.parse(resp.text.splitlines())
+    delay = parser.crawl_delay(agent)
+    if delay:
+        return float(delay)
+    rate = parser.request_rate(agent)
+    if rate and rate.requests:
+        return rate.seconds / rate.requests
+    return None
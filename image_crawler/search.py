@@ -0,0 +1,230 @@
+import json
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape
+from urllib.parse import urlparse
+
+from .cache import SearchCache
+from .config import (
+    GOOGLE_API_KEY, GOOGLE_CX, GOOGLE_API_ENDPOINT, UNSPLASH_ACCESS_KEY, UNSPLASH_ENDPOINT, SEARCH_CACHE_TTL,
+    SCRAPE_PAGE_SIZE, SCRAPE_MAX_PAGES, SCRAPE_CONCURRENCY, SCRAPE_DELAY,
+)
+from .net import SESSION, RATE_LIMITER
+from .ratelimit import robots_delay
+
+_cache = None
+_cache_lock = threading.Lock()
+_cache_disabled = SEARCH_CACHE_TTL <= 0
+
+
+def _no_log(message):
+    pass
+
+
+def get_search_cache():
+    """The shared SearchCache, opened on first use; None when caching is off."""
+    global _cache
+    with _cache_lock:
+        if _cache is None and not _cache_disabled:
+            _cache = SearchCache()
+        return _cache
+
+
+def set_search_cache(cache):
+    """Replaces the shared SearchCache; None turns caching off."""
+    global _cache, _cache_disabled
+    with _cache_lock:
+        _cache = cache
+        _cache_disabled = cache is None
+
+
+def _get_json(engine, url, params, log, metrics=None):
+    cache = get_search_cache()
+    key = cache.make_key(engine, url, params) if cache is not None else None
+    if key is not None:
+        try:
+            data = cache.get(key)
+        except sqlite3.Error as e:
+            # A broken cache only costs the request
+            log(f"[ERROR] Search cache: {e}")
+            data = None
+        if data is not None:
+            log(f"[DEBUG] {engine} response from cache")
+            if metrics is not None:
+                metrics.count("search_cache_hits")
+            return data
+    resp = SESSION.get(url, params=params, timeout=10)
+    if metrics is not None:
+        metrics.observe("search_page", resp.elapsed.total_seconds(), engine=engine)
+    log(f"[DEBUG] {engine} response status: {resp.status_code}")
+    resp.raise_for_status()
+    data = resp.json()
+    if key is not None:
+        try:
+            cache.put(key, data)
+        except sqlite3.Error as e:
+            log(f"[ERROR] Search cache: {e}")
+    return data
+
+
+def iter_google_api(query, log=_no_log, metrics=None):
+    """
+    Yields image URLs from the Google Custom Search API one result page at
+    a time. The next page is only requested once the caller has consumed
+    the previous one; the API serves at most 100 results per query.
+    """
+    url = GOOGLE_API_ENDPOINT
+    params = {
+        'q': query,
+        'cx': GOOGLE_CX,
+        'key': GOOGLE_API_KEY,
+        'searchType': 'image',
+        'num': 10,
+        'imgType': 'photo',
+        'safe': 'medium'
+    }
+    start = 1
+    while start <= 91:
+        params['start'] = start
+        try:
+            log(f"[DEBUG] Google API request: start={start}")
+            data = _get_json("Google API", url, params, log, metrics)
+            items = data.get('items', [])
+        except Exception as e:
+            log(f"[ERROR] Google API error: {e}")
+            return
+        log(f"[DEBUG] Google API got {len(items)} items in this batch.")
+        for item in items:
+            yield item['link']
+        start += len(items)
+        if len(items) < 10:
+            return
+
+
+def iter_unsplash(query, log=_no_log, metrics=None):
+    """
+    Kindly reminder that unsplash isn't good for Burmese Foods, I just overdid and 
+    don't wanna remove it so that why it is here!
+    Yields URLs page by page, like iter_google_api.
+    """
+    url = UNSPLASH_ENDPOINT
+    params = {
+        'query': query,
+        'client_id': UNSPLASH_ACCESS_KEY,
+        'per_page': 30,
+        'orientation': 'landscape'
+    }
+    page = 1
+    while True:
+        params['page'] = page
+        try:
+            log(f"[DEBUG] Unsplash API request: page {page}")
+            data = _get_json("Unsplash API", url, params, log, metrics)
+            items = data.get('results', [])
+        except Exception as e:
+            log(f"[ERROR] Unsplash API error: {e}")
+            return
+        log(f"[DEBUG] Unsplash API got {len(items)} items in this batch.")
+        for item in items:
+            yield item['urls'].get('full') or item['urls'].get('regular')
+        page += 1
+        if len(items) < params['per_page']:
+            return
+
+
+# ["https://full.res/image.jpg",height,width] triples in the page's embedded JSON
+_JSON_IMAGE_RE = re.compile(r'\["(https?://[^"\\]*(?:\\.[^"\\]*)*)",(\d+),(\d+)\]')
+_IMG_TAG_RE = re.compile(r'<img\b[^>]*?\s(?:data-src|src)="(https://[^"]+)"', re.IGNORECASE)
+_THUMBNAIL_HOSTS = ("gstatic.com", "googleusercontent.com")
+
+
+def extract_image_urls(html):
+    """
+    Pulls image URLs out of a Google Images result page. Full-resolution
+    URLs come from the JSON the page embeds for its viewer, followed by the
+    <img> thumbnails as a fallback. Plain regex scans, no DOM is built.
+    """
+    full, thumbs = [], []
+    for raw, _, _ in _JSON_IMAGE_RE.findall(html):
+        try:
+            img_url = json.loads(f'"{raw}"')
+        except ValueError:
+            continue
+        if any(host in urlparse(img_url).netloc for host in _THUMBNAIL_HOSTS):
+            thumbs.append(img_url)
+        else:
+            full.append(img_url)
+    for img_url in _IMG_TAG_RE.findall(html):
+        if not any(x in img_url for x in ["logo", "sprite"]):
+            thumbs.append(unescape(img_url))
+    return list(dict.fromkeys(full + thumbs))
+
+
+_SCRAPE_SITE = "https://www.google.com"
+_scrape_rate_set = False
+_scrape_rate_lock = threading.Lock()
+
+
+def _set_scrape_rate(log):
+    """
+    Holds the scrape target to one request per SCRAPE_DELAY seconds, or per
+    its robots.txt crawl delay if that is longer. Checked once per process.
+    """
+    global _scrape_rate_set
+    with _scrape_rate_lock:
+        if _scrape_rate_set:
+            return
+        robots = robots_delay(SESSION, _SCRAPE_SITE)
+        delay = max(SCRAPE_DELAY, robots or 0)
+        if robots:
+            log(f"[DEBUG] Google robots.txt crawl delay: {robots}s")
+        RATE_LIMITER.configure(urlparse(_SCRAPE_SITE).netloc, 1 / delay if delay > 0 else 0)
+        _scrape_rate_set = True
+
+
+def iter_google_scrape(query, log=_no_log, metrics=None):
+    """
+    Yields image URLs scraped from Google Images result pages until a page
+    adds nothing new or SCRAPE_MAX_PAGES is reached. Up to
+    SCRAPE_CONCURRENCY pages are fetched at once, with request starts at
+    least SCRAPE_DELAY seconds (or the robots.txt crawl delay) apart; the
+    next wave is only fetched once the caller has consumed the previous one.
+    """
+    url = _SCRAPE_SITE + "/search"
+    _set_scrape_rate(log)
+
+    def fetch_page(page):
+        params = {"q": query, "tbm": "isch", "start": page * SCRAPE_PAGE_SIZE, "ijn": page}
+        log(f"[DEBUG] Google request: page {page}")
+        resp = SESSION.get(url, params=params, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+        if metrics is not None:
+            metrics.observe("search_page", resp.elapsed.total_seconds(), engine="Google")
+        resp.raise_for_status()
+        return extract_image_urls(resp.text)
+
+    seen = set()
+    page = 0
+    with ThreadPoolExecutor(max_workers=SCRAPE_CONCURRENCY) as executor:
+        while page < SCRAPE_MAX_PAGES:
+            wave = range(page, min(page + SCRAPE_CONCURRENCY, SCRAPE_MAX_PAGES))
+            futures = [executor.submit(fetch_page, p) for p in wave]
+            added = 0
+            for p, fut in zip(wave, futures):
+                try:
+                    urls = fut.result()
+                except Exception as e:
+                    if p == 0:
+                        raise
+                    log(f"[ERROR] Google page {p} error: {e}")
+                    continue
+                for img_url in urls:
+                    if img_url not in seen:
+                        seen.add(img_url)
+                        added += 1
+                        yield img_url
+            page += len(wave)
+            log(f"[DEBUG] Google: scraped {page} pages, {len(seen)} image URLs so far.")
+            if not added:
+                return
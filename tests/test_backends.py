@@ -0,0 +1,77 @@
+import time
+from itertools import islice
+
+import pytest
+
+from image_crawler import backends
+from image_crawler.backends import FanOutBackend, SearchBackend, get_backend
+
+
+class StubBackend(SearchBackend):
+    page_size = 2
+
+    def __init__(self, name, urls, delay=0.0, error=None, configured=True):
+        self.name = name
+        self.urls = urls
+        self.delay = delay
+        self.error = error
+        self.configured = configured
+        self.pulled = 0
+
+    def search(self, query, log=backends._no_log, metrics=None):
+        for url in self.urls:
+            time.sleep(self.delay)
+            self.pulled += 1
+            yield url
+        if self.error is not None:
+            raise self.error
+
+    def available(self):
+        return self.configured
+
+
+@pytest.fixture
+def register(monkeypatch):
+    def add(*stubs):
+        for stub in stubs:
+            monkeypatch.setitem(backends._backends, stub.name, stub)
+        return get_backend("+".join(stub.name for stub in stubs))
+
+    return add
+
+
+def test_fan_out_drops_urls_another_engine_returned(register):
+    fan_out = register(
+        StubBackend("A", ["https://img.example/1.jpg", "https://img.example/2.jpg?utm_source=a"]),
+        StubBackend("B", ["https://IMG.example/2.jpg", "https://img.example/3.jpg"]),
+    )
+    assert isinstance(fan_out, FanOutBackend)
+    urls = list(fan_out.search("cats"))
+    assert len(urls) == 3
+    assert {url.rsplit("/", 1)[1][0] for url in urls} == {"1", "2", "3"}
+
+
+def test_failed_or_unconfigured_engines_are_left_out(register):
+    logs = []
+    fan_out = register(
+        StubBackend("A", ["https://a.example/1.jpg"], error=RuntimeError("quota exceeded")),
+        StubBackend("B", ["https://b.example/1.jpg", "https://b.example/2.jpg"]),
+        StubBackend("C", ["https://c.example/1.jpg"], configured=False),
+    )
+    urls = list(fan_out.search("cats", logs.append))
+    assert sorted(urls) == ["https://a.example/1.jpg", "https://b.example/1.jpg", "https://b.example/2.jpg"]
+    assert any("A search failed: quota exceeded" in line for line in logs)
+    assert any("C is not configured" in line for line in logs)
+
+
+def test_fast_engine_is_not_held_up_by_a_slow_one(register):
+    slow = StubBackend("Slow", [f"https://slow.example/{i}.jpg" for i in range(10)], delay=1.0)
+    fast = StubBackend("Fast", [f"https://fast.example/{i}.jpg" for i in range(20)])
+    started = time.monotonic()
+    results = register(slow, fast).search("cats")
+    first = list(islice(results, 5))
+    assert time.monotonic() - started < 0.5
+    assert all(url.startswith("https://fast.example/") for url in first)
+    results.close()
+    # Each engine only runs a page ahead of what was taken from it
+    assert fast.pulled <= 5 + fast.page_size
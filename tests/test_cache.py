@@ -0,0 +1,85 @@
+import json
+import sqlite3
+
+import pytest
+
+from image_crawler import cache as cache_module, search
+from image_crawler.cache import SearchCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def _open(tmp_path, **kwargs):
+    return SearchCache(str(tmp_path / "search.sqlite"), **kwargs)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = _open(tmp_path, ttl=60, max_bytes=10_000)
+    cache.put("k", {"items": [1, 2]})
+    clock.now += 59
+    assert cache.get("k") == {"items": [1, 2]}
+    clock.now += 2
+    assert cache.get("k") is None
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    payload = {"items": ["x" * 80]}
+    cache = _open(tmp_path, ttl=3600, max_bytes=250)
+    cache.put("a", payload)
+    clock.now += 1
+    cache.put("b", payload)
+    clock.now += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == payload
+    clock.now += 1
+    cache.put("c", payload)
+    assert cache.get("b") is None
+    assert cache.get("a") == payload
+    assert cache.get("c") == payload
+    cache.close()
+
+
+def test_keys_ignore_credentials():
+    params = {"q": "cats", "page": 1}
+    key = SearchCache.make_key("Unsplash API", "https://api/search", dict(params, client_id="one"))
+    assert key == SearchCache.make_key("Unsplash API", "https://api/search", dict(params, client_id="two"))
+    assert key != SearchCache.make_key("Unsplash API", "https://api/search", dict(params, page=2))
+
+
+def test_keys_keep_the_search_engine_id():
+    params = {"q": "cats", "start": 1, "key": "secret"}
+    key = SearchCache.make_key("Google API", "https://api/search", dict(params, cx="one"))
+    assert key != SearchCache.make_key("Google API", "https://api/search", dict(params, cx="two"))
+
+
+class BrokenCache(SearchCache):
+    def __init__(self):
+        pass
+
+    def get(self, key):
+        raise sqlite3.OperationalError("database is locked")
+
+    def put(self, key, payload):
+        raise sqlite3.OperationalError("disk I/O error")
+
+
+def test_search_works_around_a_broken_cache(serve, monkeypatch):
+    url = serve(lambda request: (200, {}, json.dumps({"items": []}).encode()))
+    monkeypatch.setattr(search, "get_search_cache", BrokenCache)
+    logged = []
+    assert search._get_json("Google API", url, {"q": "cats"}, logged.append) == {"items": []}
+    assert sum("Search cache" in line for line in logged) == 2
@@ -0,0 +1,40 @@
+import pytest
+
+from image_crawler import backends
+from image_crawler.backends import SearchBackend
+from image_crawler.cli import main
+
+
+class StubBackend(SearchBackend):
+    name = "Stub"
+
+    def search(self, query, log=backends._no_log, metrics=None):
+        if query == "broken":
+            raise RuntimeError("search failed")
+        # Plain http URLs are skipped without a request, so nothing downloads
+        if query != "nothing":
+            yield from (f"http://img.example/{query}/{i}.jpg" for i in range(3))
+
+
+@pytest.fixture
+def crawl(tmp_path, monkeypatch):
+    monkeypatch.setitem(backends._backends, StubBackend.name, StubBackend())
+
+    def run(*queries):
+        return main([*queries, "-e", "Stub", "-n", "2", "-o", str(tmp_path), "--processes", "0", "--no-search-cache"])
+
+    return run
+
+
+def test_queries_with_nothing_downloaded_still_succeed(crawl):
+    assert crawl("cats") == 0
+    assert crawl("cats", "dogs") == 0
+
+
+def test_empty_search_fails_the_run(crawl):
+    assert crawl("nothing") == 1
+    assert crawl("cats", "nothing") == 1
+
+
+def test_failed_query_fails_the_batch(crawl):
+    assert crawl("cats", "broken") == 1
@@ -0,0 +1,81 @@
+import os
+import random
+
+import pytest
+from PIL import Image, ImageEnhance
+
+from image_crawler.dedup import ImageIndex, dhash, normalize_url
+
+
+def _picture(flip=False):
+    # Smooth blobs, so the dHash has real edges to compare
+    img = Image.frombytes("RGB", (16, 16), random.Random(1).randbytes(16 * 16 * 3)).resize((256, 256), Image.BICUBIC)
+    return img.transpose(Image.FLIP_LEFT_RIGHT) if flip else img
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ImageIndex(str(tmp_path), max_distance=5)
+    yield index
+    index.close()
+
+
+def _save(index, name, url, sha, phash):
+    path = os.path.join(index.folder, name)
+    open(path, "wb").close()
+    index.add(url, sha, phash, path)
+    return path
+
+
+def test_claim_holds_an_image_until_added_or_released(index):
+    phash = dhash(_picture())
+    assert index.claim("a", phash) is None
+    assert index.claim("a", phash) == "(in progress)"
+    index.release("a")
+    assert index.claim("a", phash) is None
+    path = _save(index, "cats_1.jpg", "https://img.example/a.jpg", "a", phash)
+    assert index.claim("a", phash) == path
+
+
+def test_near_duplicates_are_caught(index):
+    original = _picture()
+    path = _save(index, "cats_1.jpg", "https://img.example/a.jpg", "a", dhash(original))
+    brighter = ImageEnhance.Brightness(original).enhance(1.1).resize((50, 50))
+    assert index.claim("b", dhash(brighter)) == path
+    assert index.claim("c", dhash(_picture(flip=True))) is None
+
+
+def test_exact_only_index_ignores_near_duplicates(tmp_path):
+    index = ImageIndex(str(tmp_path), max_distance=-1)
+    phash = dhash(_picture())
+    _save(index, "cats_1.jpg", "https://img.example/a.jpg", "a", phash)
+    assert index.claim("b", phash) is None
+    assert index.claim("a", phash) is not None
+    index.close()
+
+
+def test_deleted_files_are_forgotten(index):
+    phash = dhash(_picture())
+    path = _save(index, "cats_1.jpg", "https://img.example/a.jpg", "a", phash)
+    os.remove(path)
+    assert not index.has_url("https://img.example/a.jpg")
+    assert index.claim("a", phash) is None
+
+
+def test_index_survives_moving_the_folder(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    index = ImageIndex(str(folder))
+    _save(index, "cats_1.jpg", "https://IMG.example:443/a.jpg?utm_source=x#top", "a", dhash(_picture()))
+    index.close()
+    os.rename(folder, tmp_path / "moved")
+    index = ImageIndex(str(tmp_path / "moved"))
+    assert index.has_url("https://img.example/a.jpg")
+    assert index.claim("a", 0) == str(tmp_path / "moved" / "cats_1.jpg")
+    index.close()
+
+
+def test_normalize_url_drops_tracking_and_sorts_the_query():
+    assert normalize_url("HTTPS://Img.Example:443/a.jpg?b=2&fbclid=x&a=1&utm_medium=y#frag") == (
+        "https://img.example/a.jpg?a=1&b=2"
+    )
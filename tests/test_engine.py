@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import threading
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from image_crawler.engine import (
+    CrawlOptions, DownloadError, run_crawl, run_batch, _download_body, _free_path, _taken_numbers,
+)
+from image_crawler.metrics import Metrics
+
+
+def test_numbers_are_taken_across_extensions(tmp_path):
+    for name in ("cats_1.jpg", "cats_2.webp", "cats_4.png", "cats_10.gif", "cats_x.jpg", "dogs_3.jpg", ".x.part"):
+        (tmp_path / name).write_bytes(b"")
+    taken = _taken_numbers(str(tmp_path), "cats")
+    assert taken == {1, 2, 4, 10}
+
+    number, fn = _free_path(str(tmp_path), "cats", 0, "gif", taken)
+    assert (number, fn) == (3, os.path.join(str(tmp_path), "cats_3.gif"))
+    number, fn = _free_path(str(tmp_path), "cats", number, "jpg", taken)
+    assert number == 5
+    assert {3, 5} <= taken
+
+
+def test_stem_is_matched_literally(tmp_path):
+    (tmp_path / "a.b_1.jpg").write_bytes(b"")
+    (tmp_path / "axb_2.jpg").write_bytes(b"")
+    assert _taken_numbers(str(tmp_path), "a.b") == {1}
+
+
+class Events(list):
+    def put(self, item):
+        self.append(item)
+
+
+def test_crawl_into_a_missing_folder_still_finishes(tmp_path):
+    events = Events()
+    options = CrawlOptions(engine="Unsplash", folder=str(tmp_path / "missing"), processes=0)
+    with pytest.raises(sqlite3.Error):
+        run_crawl("cats", options, events)
+    assert events[-1] == ("finished", (0, 0))
+    assert any(kind == "log" and "[ERROR]" in data for kind, data in events)
+
+
+def test_batch_into_a_missing_folder_still_finishes(tmp_path):
+    events = Events()
+    options = CrawlOptions(engine="Unsplash", folder=str(tmp_path / "missing"), processes=0)
+    with pytest.raises(sqlite3.Error):
+        run_batch(["cats", "dogs"], options, events)
+    assert events[-1] == ("finished", (0, 0))
+
+
+def _png(size):
+    out = BytesIO()
+    Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).save(out, "PNG", compress_level=0)
+    return out.getvalue()
+
+
+def _fetch(serve, body, content_type="image/png", **options):
+    url = serve(lambda request: (200, {"Content-Type": content_type}, body)) + "/image"
+    logs, metrics = [], Metrics()
+    result = _download_body(url, CrawlOptions(**options), logs.append, threading.Event(), None, None, metrics)
+    return result, logs, metrics.summary()["counters"].get("bytes", 0)
+
+
+def test_download_keeps_acceptable_images(serve):
+    body = _png((300, 200))
+    result, logs, received = _fetch(serve, body)
+    assert result == body and received == len(body) and not logs
+
+
+def test_non_images_are_refused(serve):
+    with pytest.raises(DownloadError, match="Not an image"):
+        _fetch(serve, b"<html></html>", content_type="text/html")
+
+
+def test_oversized_images_are_dropped_before_the_body(serve):
+    result, logs, received = _fetch(serve, _png((300, 200)), max_bytes=100_000)
+    assert result is None and received == 0
+    assert "over the size limit" in logs[0]
+
+
+def test_small_images_are_aborted_after_the_header(serve):
+    body = _png((2000, 50))
+    result, logs, received = _fetch(serve, body, min_width=100, min_height=100)
+    assert result is None and received < len(body)
+    assert "2000x50 is below 100x100" in logs[0]
+
+
+def test_strict_type_aborts_other_formats(serve):
+    body = _png((2000, 200))
+    result, logs, received = _fetch(serve, body, ftype="jpg", strict_type=True)
+    assert result is None and received < len(body)
+    assert "png is not jpg" in logs[0]
+    assert _fetch(serve, body, ftype="jpg")[0] == body
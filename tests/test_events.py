@@ -0,0 +1,40 @@
+import time
+
+from image_crawler.events import CoalescingEvents
+
+
+class Target(list):
+    def put(self, item):
+        self.append(item)
+
+
+def test_burst_is_coalesced_and_flushed_before_finished():
+    target = Target()
+    events = CoalescingEvents(target, interval=10)
+    events.put(("log", "started"))
+    for n in range(1, 51):
+        events.put(("log", f"line {n}"))
+        events.put(("progress", n))
+        events.put(("query_progress", ("cats" if n % 2 else "dogs", n, 50)))
+        events.put(("thumbnail", f"png {n}"))
+    events.put(("finished", (50, 0)))
+    assert target == [
+        ("logs", ["started"]),
+        ("logs", [f"line {n}" for n in range(1, 51)]),
+        ("query_progress", ("cats", 49, 50)),
+        ("query_progress", ("dogs", 50, 50)),
+        ("progress", 50),
+        ("thumbnails", [f"png {n}" for n in range(1, 51)]),
+        ("finished", (50, 0)),
+    ]
+
+
+def test_quiet_engine_still_gets_its_tail_delivered():
+    target = Target()
+    events = CoalescingEvents(target, interval=0.05)
+    events.put(("progress", 1))
+    events.put(("progress", 2))
+    events.put(("log", "last words"))
+    assert target == [("progress", 1)]
+    time.sleep(0.2)
+    assert target == [("progress", 1), ("logs", ["last words"]), ("progress", 2)]
@@ -0,0 +1,158 @@
+import os
+import threading
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from image_crawler.engine import CrawlOptions, _download_body
+from image_crawler.journal import CrawlJournal
+from image_crawler.metrics import Metrics
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = CrawlJournal(str(tmp_path), parts_dir=str(tmp_path / "parts"))
+    yield journal
+    journal.close()
+
+
+def test_new_job_has_nothing_to_resume(journal):
+    job = journal.job("cats", "Unsplash")
+    assert job.resume_urls() is None
+    job.start()
+    assert job.resume_urls() == []
+    assert job.done_count() == 0
+
+
+def test_add_keeps_order_and_skips_known_urls(journal):
+    job = journal.job("cats", "Unsplash")
+    job.start()
+    assert job.add("https://a/1.jpg")
+    assert job.add("https://a/2.jpg")
+    assert not job.add("https://a/1.jpg")
+    assert job.add("https://a/3.jpg")
+    assert job.resume_urls() == ["https://a/1.jpg", "https://a/2.jpg", "https://a/3.jpg"]
+
+
+def test_resume_puts_pending_before_failed_and_counts_done(journal):
+    job = journal.job("cats", "Unsplash")
+    job.start()
+    for i in range(6):
+        job.add(f"https://a/{i}.jpg")
+    job.failed("https://a/0.jpg", "HTTP 503")
+    job.done("https://a/1.jpg", "out/cats_1.jpg")
+    job.skipped("https://a/2.jpg")
+    job.failed("https://a/3.jpg", "HTTP 500")
+    job.done("https://a/5.jpg", "out/cats_2.jpg")
+
+    assert job.resume_urls() == ["https://a/4.jpg", "https://a/0.jpg", "https://a/3.jpg"]
+    assert job.done_count() == 2
+
+
+def test_finished_or_restarted_jobs_do_not_resume(journal):
+    job = journal.job("cats", "Unsplash")
+    job.start()
+    job.add("https://a/1.jpg")
+    job.finish()
+    assert job.resume_urls() is None
+
+    job.start()
+    assert job.resume_urls() == []
+    assert job.done_count() == 0
+
+
+def test_jobs_are_kept_apart(journal):
+    cats = journal.job("cats", "Unsplash")
+    dogs = journal.job("dogs", "Unsplash")
+    cats.start()
+    dogs.start()
+    cats.add("https://a/1.jpg")
+    dogs.add("https://a/1.jpg")
+    cats.done("https://a/1.jpg", "out/cats_1.jpg")
+    assert cats.done_count() == 1
+    assert dogs.resume_urls() == ["https://a/1.jpg"]
+    assert cats.part_path("https://a/1.jpg") != dogs.part_path("https://a/1.jpg")
+
+
+def test_partial_needs_recorded_bytes_and_a_validator(journal, tmp_path):
+    job = journal.job("cats", "Unsplash")
+    job.start()
+    url = "https://a/big.jpg"
+    job.add(url)
+    part = job.part_path(url)
+    (tmp_path / "parts").mkdir()
+    with open(part, "wb") as f:
+        f.write(b"x" * 300)
+
+    job.progress(url, 200, part, None)
+    assert job.partial(url) is None
+    job.progress(url, 200, part, '"v1"')
+    assert job.partial(url) == (200, '"v1"')
+    # The part file lost bytes the journal counted on
+    job.progress(url, 400, part, '"v1"')
+    assert job.partial(url) is None
+    job.failed(url, "HTTP 500")
+    assert job.partial(url) is None
+
+
+def _noise_png():
+    out = BytesIO()
+    Image.frombytes("RGB", (800, 800), os.urandom(800 * 800 * 3)).save(out, "PNG", compress_level=0)
+    return out.getvalue()
+
+
+def _image_server(serve, body, etag):
+    requests = []
+
+    def respond(request):
+        requests.append(dict(request.headers))
+        headers = {"Content-Type": "image/png", "ETag": etag}
+        ranged = request.headers.get("Range", "")
+        if ranged and request.headers.get("If-Range") == etag:
+            start = int(ranged[len("bytes="):-1])
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            return 206, headers, body[start:]
+        return 200, headers, body
+
+    return serve(respond) + "/cat.png", requests
+
+
+def _download(url, job, part):
+    return _download_body(url, CrawlOptions(), lambda message: None, threading.Event(), job, part, Metrics())
+
+
+def test_download_resumes_from_the_part_file(journal, serve):
+    body = _noise_png()
+    url, requests = _image_server(serve, body, '"v1"')
+    job = journal.job("cats", "Unsplash")
+    job.start()
+    job.add(url)
+    part = job.part_path(url)
+    os.makedirs(os.path.dirname(part))
+    offset = 1_500_000
+    with open(part, "wb") as f:
+        f.write(body[:offset])
+    job.progress(url, offset, part, '"v1"')
+
+    assert _download(url, job, part) == body
+    assert requests[0]["Range"] == f"bytes={offset}-" and requests[0]["If-Range"] == '"v1"'
+    # The finished body is spooled too, ready to resume from its end
+    assert job.partial(url) == (len(body), '"v1"')
+
+
+def test_changed_image_is_fetched_whole(journal, serve):
+    body = _noise_png()
+    url, requests = _image_server(serve, body, '"v2"')
+    job = journal.job("cats", "Unsplash")
+    job.start()
+    job.add(url)
+    part = job.part_path(url)
+    os.makedirs(os.path.dirname(part))
+    with open(part, "wb") as f:
+        f.write(os.urandom(1_500_000))
+    job.progress(url, 1_500_000, part, '"v1"')
+
+    assert _download(url, job, part) == body
+    assert requests[0]["If-Range"] == '"v1"'
+    assert job.partial(url) == (len(body), '"v2"')
@@ -0,0 +1,65 @@
+import time
+
+from image_crawler.net import make_session, grow_pools
+
+
+def test_server_errors_are_retried(serve):
+    hits = []
+
+    def respond(request):
+        hits.append(request.path)
+        return (502 if len(hits) < 3 else 200), {}, b"ok"
+
+    session = make_session(retries=3, backoff=0.01)
+    assert session.get(serve(respond)).status_code == 200
+    assert len(hits) == 3
+
+
+def test_retry_after_is_honored_without_a_limiter(serve):
+    hits = []
+
+    def respond(request):
+        hits.append(time.monotonic())
+        return (429, {"Retry-After": "1"}, b"") if len(hits) == 1 else (200, {}, b"ok")
+
+    session = make_session(retries=1, backoff=0.01)
+    assert session.get(serve(respond)).status_code == 200
+    assert hits[1] - hits[0] >= 0.9
+
+
+def test_grow_pools_only_grows(serve):
+    url = serve(lambda request: (200, {}, b"ok"))
+    session = make_session(pool_size=2)
+    adapter = session.get_adapter(url)
+    grow_pools(session, 10)
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 10
+    grow_pools(session, 4)
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 10
+    assert session.get(url).status_code == 200
+
+
+def test_timings_split_connect_from_ttfb(serve):
+    def respond(request):
+        time.sleep(0.2)
+        return 200, {}, b"ok"
+
+    url = serve(respond)
+    session = make_session()
+    first, second = session.get(url), session.get(url)
+    assert first.timings["connect"] > 0
+    assert second.timings["connect"] == 0.0  # kept alive
+    assert 0.2 <= second.timings["ttfb"] < 0.5
+
+
+def test_ttfb_leaves_out_retry_backoff(serve):
+    hits = []
+
+    def respond(request):
+        hits.append(request.path)
+        return (502 if len(hits) < 3 else 200), {}, b"ok"
+
+    # urllib3 sleeps from the second retry on: 0.5 * 2 ** 1 seconds here
+    resp = make_session(retries=2, backoff=0.5).get(serve(respond))
+    assert resp.status_code == 200 and len(hits) == 3
+    assert resp.timings["ttfb"] < 0.5
+    assert resp.elapsed.total_seconds() >= 0.5
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from image_crawler import search
+from image_crawler.pool import ConcurrentDownloader, FairSemaphore
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+class Tracker:
+    """A download job that records how many jobs ran at once, overall and per host."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.running = Counter()
+        self.peak = Counter()
+
+    def __call__(self, url):
+        host = url.split("/")[2]
+        with self.lock:
+            self.calls += 1
+            for key in (host, "all"):
+                self.running[key] += 1
+                self.peak[key] = max(self.peak[key], self.running[key])
+        time.sleep(self.delay)
+        with self.lock:
+            self.running[host] -= 1
+            self.running["all"] -= 1
+        return url
+
+
+def test_imap_stops_at_max_n_without_extra_jobs():
+    job = Tracker()
+    urls = (f"https://img{i % 4}.example/{i}.jpg" for i in range(100))
+    results = list(ConcurrentDownloader(workers=8, per_host=8).imap(job, urls, 5))
+    assert len(results) == 5
+    assert job.calls == 5
+
+
+def test_imap_holds_each_host_to_per_host():
+    job = Tracker()
+    urls = [f"https://img{i % 2}.example/{i}.jpg" for i in range(12)]
+    urls += [f"https://other.example/{i}.jpg" for i in range(4)]
+    results = list(ConcurrentDownloader(workers=8, per_host=2).imap(job, urls, 100))
+    assert len(results) == 16
+    assert job.peak["img0.example"] == job.peak["img1.example"] == job.peak["other.example"] == 2
+    assert job.peak["all"] == 6
+
+
+def test_imap_hands_late_results_to_discard():
+    release = threading.Event()
+    discarded = []
+
+    def job(url):
+        if not url.endswith("/0.jpg"):
+            release.wait(5)
+        return url
+
+    urls = [f"https://img{i}.example/{i}.jpg" for i in range(4)]
+    results = ConcurrentDownloader(workers=4, per_host=1).imap(job, urls, 4, discard=discarded.append)
+    assert next(results)[0] == "https://img0.example/0.jpg"
+    results.close()
+    release.set()
+    _wait_for(lambda: len(discarded) == 3)
+    assert sorted(discarded) == urls[1:]
+
+
+def test_fair_semaphore_grants_in_request_order():
+    slots = FairSemaphore(1)
+    assert slots.acquire()
+    granted = []
+
+    def take(name):
+        slots.acquire()
+        granted.append(name)
+
+    threads = []
+    for name in "abcd":
+        thread = threading.Thread(target=take, args=(name,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        # Queue them up one at a time so the request order is known
+        _wait_for(lambda: len(slots._waiting) == len(threads))
+
+    for n in range(1, 5):
+        slots.release()
+        _wait_for(lambda: len(granted) == n)
+    assert granted == list("abcd")
+    for thread in threads:
+        thread.join(1)
+
+
+def test_fair_semaphore_acquire_gives_up_on_stop():
+    slots = FairSemaphore(1)
+    assert slots.acquire()
+    stop_event = threading.Event()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(slots.acquire(stop_event)), daemon=True)
+    thread.start()
+    _wait_for(lambda: slots._waiting)
+    stop_event.set()
+    thread.join(5)
+    assert result == [False]
+    assert not slots._waiting
+
+
+def _count_google_pages(monkeypatch):
+    pages = []
+
+    def fake_get_json(engine, url, params, log, metrics=None):
+        start = params["start"]
+        pages.append(start)
+        return {"items": [{"link": f"https://img{i % 3}.example/{i}.jpg"} for i in range(start, start + 10)]}
+
+    monkeypatch.setattr(search, "_get_json", fake_get_json)
+    return pages
+
+
+@pytest.mark.parametrize("max_n, expected_pages", [(5, [1]), (10, [1]), (11, [1, 11]), (25, [1, 11, 21])])
+def test_imap_only_searches_pages_it_needs(monkeypatch, max_n, expected_pages):
+    pages = _count_google_pages(monkeypatch)
+    downloader = ConcurrentDownloader(workers=8, per_host=2)
+    results = list(downloader.imap(lambda url: url, search.iter_google_api("cats"), max_n))
+    assert len(results) == max_n
+    assert pages == expected_pages
+
+
+def test_imap_searches_further_when_downloads_fail(monkeypatch):
+    pages = _count_google_pages(monkeypatch)
+
+    def job(url):
+        if int(url.rsplit("/", 1)[1].split(".")[0]) % 2:
+            raise ValueError("broken")
+        return url
+
+    downloader = ConcurrentDownloader(workers=4, per_host=4)
+    results = list(downloader.imap(job, search.iter_google_api("cats"), 10))
+    assert sum(1 for _, result, _ in results if result) == 10
+    assert pages == [1, 11]
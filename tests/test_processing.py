@@ -0,0 +1,59 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from image_crawler.processing import HeaderSniffer, process_image
+
+
+def _mpo(size=(1600, 1200)):
+    out = BytesIO()
+    Image.new("RGB", size, "red").save(out, "MPO", save_all=True, append_images=[Image.new("RGB", size, "blue")])
+    return out.getvalue()
+
+
+def test_mpo_is_saved_as_jpeg_untouched():
+    data = _mpo()
+    result = process_image(data, upscale=False)
+    assert (result.ext, result.source_ext) == ("jpg", "jpg")
+    assert result.data == data
+
+
+def test_mpo_converts_like_jpeg():
+    result = process_image(_mpo(), ftype="png", upscale=False)
+    assert result.ext == "png"
+    assert Image.open(BytesIO(result.data)).format == "PNG"
+
+
+def test_sniffer_reports_mpo_as_jpg():
+    data = _mpo()
+    sniffer = HeaderSniffer()
+    assert any(sniffer.feed(data[i:i + 512]) for i in range(0, len(data), 512))
+    assert (sniffer.ext, sniffer.size) == ("jpg", (1600, 1200))
+
+
+def _encoded(fmt, size=(321, 123), **params):
+    out = BytesIO()
+    Image.new("RGB", size, "red").save(out, fmt, **params)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("fmt, params, ext", [
+    ("JPEG", {}, "jpg"),
+    ("PNG", {}, "png"),
+    ("GIF", {}, "gif"),
+    ("WEBP", {"lossless": False}, "webp"),
+    ("WEBP", {"lossless": True}, "webp"),
+    ("WEBP", {"exif": b"Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00"}, "webp"),
+])
+def test_sniffer_reads_the_header_only(fmt, params, ext):
+    data = _encoded(fmt, **params)
+    sniffer = HeaderSniffer()
+    assert any(sniffer.feed(data[i:i + 40]) for i in range(0, len(data), 40))
+    assert (sniffer.ext, sniffer.size) == (ext, (321, 123))
+
+
+def test_sniffer_waits_for_more_bytes():
+    sniffer = HeaderSniffer()
+    assert not sniffer.feed(_encoded("PNG")[:10])
+    assert sniffer.size is None
@@ -0,0 +1,100 @@
+import json
+import time
+from urllib.parse import urlparse, parse_qs
+
+from image_crawler import ratelimit, search
+from image_crawler.net import make_session
+from image_crawler.ratelimit import TokenBucket, RateLimiter
+
+
+def test_slow_down_halves_the_rate_down_to_a_sixteenth():
+    bucket = TokenBucket(8)
+    bucket.slow_down()
+    assert bucket.rate == 4
+    for _ in range(10):
+        bucket.slow_down()
+    assert bucket.rate == 0.5
+
+
+def test_speed_up_wins_back_a_sixteenth_up_to_the_ceiling():
+    bucket = TokenBucket(8)
+    bucket.slow_down()
+    bucket.speed_up()
+    assert bucket.rate == 4.5
+    for _ in range(20):
+        bucket.speed_up()
+    assert bucket.rate == 8
+
+
+def test_pause_holds_requests_back():
+    bucket = TokenBucket(1000, burst=10)
+    bucket.pause(0.2)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_pause_is_capped(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_MAX_WAIT", 0.1)
+    bucket = TokenBucket(1000)
+    bucket.pause(3600)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start < 1
+
+
+def test_retry_after_parses_seconds_and_dates():
+    assert ratelimit._retry_after("120") == 120
+    assert ratelimit._retry_after("") is None
+    assert ratelimit._retry_after("soon") is None
+    assert ratelimit._retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_session_retries_throttled_requests_after_retry_after(serve):
+    hits = []
+
+    def respond(request):
+        hits.append(time.monotonic())
+        if len(hits) == 1:
+            return 429, {"Retry-After": "1"}, b""
+        return 200, {}, b"ok"
+
+    url = serve(respond)
+    limiter = RateLimiter(default_rate=100, burst=10)
+    session = make_session(limiter=limiter, retries=2)
+    resp = session.get(url + "/page")
+    assert resp.status_code == 200
+    assert len(hits) == 2
+    assert hits[1] - hits[0] >= 0.9
+
+
+def test_session_gives_up_after_its_retries(serve):
+    hits = []
+
+    def respond(request):
+        hits.append(request.path)
+        return 503, {"Retry-After": "0"}, b""
+
+    url = serve(respond)
+    session = make_session(retries=2)
+    assert session.get(url + "/page").status_code == 503
+    assert len(hits) == 3
+
+
+def test_throttled_search_page_is_retried(serve, monkeypatch):
+    pages = []
+
+    def respond(request):
+        start = int(parse_qs(urlparse(request.path).query)["start"][0])
+        pages.append(start)
+        if start == 11 and pages.count(11) == 1:
+            return 429, {"Retry-After": "1"}, b""
+        items = [{"link": f"https://img.example/{i}.jpg"} for i in range(start, start + 10)]
+        return 200, {"Content-Type": "application/json"}, json.dumps({"items": items}).encode()
+
+    url = serve(respond)
+    monkeypatch.setattr(search, "GOOGLE_API_ENDPOINT", url + "/customsearch/v1")
+    monkeypatch.setattr(search, "get_search_cache", lambda: None)
+    urls = list(search.iter_google_api("cats"))
+    assert len(urls) == 100
+    assert pages.count(11) == 2
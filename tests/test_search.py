@@ -0,0 +1,57 @@
+import os
+from urllib.parse import urlparse
+
+import pytest
+
+from image_crawler.search import extract_image_urls
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+THUMBNAIL_HOSTS = ("gstatic.com", "googleusercontent.com")
+
+
+def _is_thumbnail(url):
+    return any(host in urlparse(url).netloc for host in THUMBNAIL_HOSTS)
+
+
+@pytest.fixture(params=sorted(os.listdir(FIXTURES)))
+def page(request):
+    with open(os.path.join(FIXTURES, request.param), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_fixture_full_res_urls_come_first(page):
+    urls = extract_image_urls(page)
+    full = [url for url in urls if not _is_thumbnail(url)]
+    # The fixtures hold 100 results, each with a full-res URL and a thumbnail
+    assert len(full) == 100
+    assert urls[:100] == full
+    assert all(_is_thumbnail(url) for url in urls[100:])
+
+
+def test_fixture_urls_are_unescaped(page):
+    urls = extract_image_urls(page)
+    thumbs = [url for url in urls if _is_thumbnail(url)]
+    assert thumbs and all("?q=tbn:" in url and "&usqp=CAU" in url for url in thumbs)
+    assert not any("\\u003d" in url or "\\u0026" in url or "&amp;" in url for url in urls)
+
+
+def test_fixture_drops_logos_sprites_and_duplicates(page):
+    urls = extract_image_urls(page)
+    assert not any("logo" in url or "sprite" in url for url in urls)
+    assert len(urls) == len(set(urls)) == 200
+
+
+def test_extract_orders_json_then_img_tags():
+    html = (
+        '<img src="https://www.google.com/logo.png">'
+        '<img class="rg_i" data-src="https://encrypted-tbn0.gstatic.com/images?q=tbn:a&amp;s=1">'
+        '<img class="rg_i" src="https://example.com/tag-only.jpg">'
+        '<script>data:[["https://encrypted-tbn0.gstatic.com/images?q\\u003dtbn:a\\u0026s\\u003d1",194,259],'
+        '["https://cdn.example.com/full.jpg?w\\u003d1200\\u0026h\\u003d800",800,1200],'
+        '["https://cdn.example.com/full.jpg?w\\u003d1200\\u0026h\\u003d800",800,1200]]</script>'
+    )
+    assert extract_image_urls(html) == [
+        "https://cdn.example.com/full.jpg?w=1200&h=800",
+        "https://encrypted-tbn0.gstatic.com/images?q=tbn:a&s=1",
+        "https://example.com/tag-only.jpg",
+    ]